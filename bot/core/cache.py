@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from aiogram.types import InlineKeyboardMarkup
+from django.conf import settings
+from django.db.models import Prefetch
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from config import config
+from web.panel.invalidation import INVALIDATION_CHANNEL
+from web.panel.models import User, Quiz, Question, Answer, AboutSection, HelpButton, HelpPart
+from .db import run_query
+from .keyboards import get_about_keyboard, get_back_to_about_keyboard, get_help_buttons_keyboard
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedAnswer:
+    id: int
+    question_id: int
+    text: str
+    is_correct: bool
+
+
+@dataclass(frozen=True, slots=True)
+class CachedQuestion:
+    id: int
+    text: str
+    answers: tuple[CachedAnswer, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class CachedQuiz:
+    id: int
+    version: int
+    questions: dict[int, CachedQuestion]
+    answers: dict[int, CachedAnswer]
+
+
+class QuizCache:
+    """Question/answer trees of quizzes keyed by ``(quiz_id, content_version)``.
+
+    Admin edits bump ``Quiz.content_version``, so new attempts ask for the new tree and the stale one
+    falls out of the LRU once the attempts started before the edit are over.
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._quizzes: OrderedDict[tuple[int, int], CachedQuiz] = OrderedDict()
+
+    async def get(self, quiz_id: int, version: int | None = None) -> CachedQuiz | None:
+        if version is None:
+            version = await run_query(
+                Quiz.objects.filter(id=quiz_id).values_list('content_version', flat=True).first
+            )
+            if version is None:
+                return None
+
+        quiz = self._quizzes.get((quiz_id, version))
+        if quiz is not None:
+            self._quizzes.move_to_end((quiz_id, version))
+            return quiz
+
+        quiz = await self._load(quiz_id)
+        if quiz is not None:
+            self._quizzes[(quiz.id, quiz.version)] = quiz
+            # Users in the middle of an edited quiz keep asking for the old version, only the current
+            # one is in the database: serve it for the old key as well instead of loading it every time.
+            self._quizzes[(quiz_id, version)] = quiz
+            while len(self._quizzes) > self.max_size:
+                self._quizzes.popitem(last=False)
+        return quiz
+
+    def invalidate(self, key=None):
+        self._quizzes.clear()
+
+    async def _load(self, quiz_id: int) -> CachedQuiz | None:
+        try:
+            quiz = await run_query(
+                Quiz.objects.prefetch_related(
+                    Prefetch('questions', queryset=Question.objects.order_by('id')),
+                    Prefetch('questions__answers', queryset=Answer.objects.order_by('id')),
+                ).get,
+                id=quiz_id,
+            )
+        except Quiz.DoesNotExist:
+            return None
+
+        questions = {}
+        answers = {}
+        for question in quiz.questions.all():
+            question_answers = tuple(
+                CachedAnswer(answer.id, question.id, answer.text, answer.is_correct)
+                for answer in question.answers.all()
+            )
+            questions[question.id] = CachedQuestion(question.id, question.text, question_answers)
+            answers.update((answer.id, answer) for answer in question_answers)
+
+        return CachedQuiz(quiz.id, quiz.content_version, questions, answers)
+
+
+quiz_cache = QuizCache()
+
+
+@dataclass(frozen=True, slots=True)
+class CachedUser:
+    id: int
+    is_active: bool
+    department_id: int | None
+    first_name: str | None
+
+    def as_user(self) -> User:
+        return User(id=self.id, is_active=self.is_active, department_id=self.department_id, first_name=self.first_name)
+
+
+class UserCache:
+    """TTL/LRU cache of the user fields the middleware and handlers need."""
+
+    def __init__(self, ttl: float = config.USER_CACHE_TTL, max_size: int = config.USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._users: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+
+    async def get(self, user_id: int) -> CachedUser | None:
+        entry = self._users.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        row = await run_query(
+            User.objects.filter(id=user_id).values_list('is_active', 'department_id', 'first_name').first
+        )
+        if row is None:
+            return None
+        return self.set(CachedUser(user_id, *row))
+
+    def set(self, user: CachedUser) -> CachedUser:
+        self._users[user.id] = (time.monotonic() + self.ttl, user)
+        self._users.move_to_end(user.id)
+        while len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int | None = None):
+        if user_id is None:
+            self._users.clear()
+        else:
+            self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {'size': len(self._users), 'hits': self.hits, 'misses': self.misses}
+
+
+user_cache = UserCache()
+
+
+@dataclass(frozen=True, slots=True)
+class CachedContent:
+    about_sections: dict[int, AboutSection]
+    about_keyboard: InlineKeyboardMarkup
+    back_to_about_keyboard: InlineKeyboardMarkup
+    help_text: str
+    help_keyboard: InlineKeyboardMarkup
+
+
+class ContentCache:
+    """About/Help texts together with their ready-built keyboards.
+
+    Every invalidation bumps ``version``; the content is reloaded on the next access.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._loaded_version = -1
+        self._content: CachedContent | None = None
+
+    async def get(self) -> CachedContent:
+        if self._content is None or self._loaded_version != self.version:
+            version = self.version
+            content = await self._load()
+            self._content, self._loaded_version = content, version
+        return self._content
+
+    def invalidate(self, key=None):
+        self.version += 1
+
+    async def _load(self) -> CachedContent:
+        sections, buttons, help_part = await run_query(self._fetch)
+
+        return CachedContent(
+            about_sections=sections,
+            about_keyboard=get_about_keyboard(sections.values()),
+            back_to_about_keyboard=get_back_to_about_keyboard(),
+            help_text=help_part.text_on_message if help_part else 'Раздел "Помощь"',
+            help_keyboard=get_help_buttons_keyboard(buttons=buttons),
+        )
+
+    @staticmethod
+    def _fetch():
+        # One trip to the DB threads for all three queries.
+        return (
+            {section.id: section for section in AboutSection.objects.order_by('order')},
+            list(HelpButton.objects.filter(is_active=True)),
+            HelpPart.objects.filter(id=1).first(),
+        )
+
+
+content_cache = ContentCache()
+
+
+async def warm_content_cache():
+    await content_cache.get()
+
+
+_invalidators = {
+    'user': user_cache.invalidate,
+    'content': content_cache.invalidate,
+}
+_listener: asyncio.Task | None = None
+
+
+async def _listen_invalidations():
+    while True:
+        redis = Redis.from_url(settings.REDIS_URL)
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Messages published while we were disconnected are lost, so start from a clean slate.
+                for invalidate in _invalidators.values():
+                    invalidate()
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    payload = json.loads(message['data'])
+                    invalidate = _invalidators.get(payload['kind'])
+                    if invalidate is not None:
+                        invalidate(payload.get('key'))
+        except (RedisError, OSError) as e:
+            logger.warning('Cache invalidation listener disconnected: %s', e)
+            await asyncio.sleep(5)
+        finally:
+            await redis.aclose()
+
+
+async def start_invalidation_listener():
+    global _listener
+    _listener = asyncio.create_task(_listen_invalidations())
+
+
+async def stop_invalidation_listener():
+    if _listener is not None:
+        _listener.cancel()
@@ -0,0 +1,35 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from config import config
+from .watchdog import InstrumentedExecutor
+
+_executor: InstrumentedExecutor | None = None
+
+
+def get_executor() -> InstrumentedExecutor:
+    global _executor
+    if _executor is None:
+        _executor = InstrumentedExecutor('bot-db', max_workers=config.BOT_DB_THREADS, thread_name_prefix='bot-db')
+    return _executor
+
+
+def _call(func, args, kwargs):
+    # Pool threads keep their connection between calls. Like Django around a request, drop one that is
+    # past CONN_MAX_AGE or was broken by the call, so that the next call reconnects.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_query(func, /, *args, **kwargs):
+    """Runs ``func`` on the pool of DB threads, every thread has its own connection.
+
+    Django's async ORM runs all queries of all updates one by one on a single shared thread.
+    With ``BOT_DB_THREADS=0`` this falls back to that behaviour.
+    """
+    if not config.BOT_DB_THREADS:
+        return await sync_to_async(func)(*args, **kwargs)
+    return await sync_to_async(_call, thread_sensitive=False, executor=get_executor())(func, args, kwargs)
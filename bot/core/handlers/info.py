@@ -1,45 +1,46 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from web.panel.models import AboutSection
-from ..keyboards import get_about_keyboard, AboutCallback, get_back_to_about_keyboard
+from ..cache import content_cache
+from ..keyboards import AboutCallback
 
 router = Router()
 
 @router.message(F.text == "О компании")
 async def handle_about(message: Message):
-    sections = [s async for s in AboutSection.objects.all().order_by('order')]
+    content = await content_cache.get()
     
-    if not sections:
+    if not content.about_sections:
         await message.answer("Информация о компании пока не добавлена.")
         return
 
     await message.answer(
         "Выберите интересующий вас раздел:",
-        reply_markup=get_about_keyboard(sections)
+        reply_markup=content.about_keyboard
     )
 
 
 @router.callback_query(AboutCallback.filter())
 async def handle_about_section_press(query: CallbackQuery, callback_data: AboutCallback):
-    section_id = callback_data.section_id
-    try:
-        section = await AboutSection.objects.aget(id=section_id)
-        
-        await query.message.edit_text(
-            text=f"🏢 {section.title}\n\n{section.text}",
-            parse_mode="HTML",
-            reply_markup=get_back_to_about_keyboard()
-        )
-    except AboutSection.DoesNotExist:
+    content = await content_cache.get()
+    section = content.about_sections.get(callback_data.section_id)
+
+    if section is None:
         await query.answer("Раздел был удален.", show_alert=True)
         await handle_back_to_list(query)
+        return
+
+    await query.message.edit_text(
+        text=f"🏢 {section.title}\n\n{section.text}",
+        parse_mode="HTML",
+        reply_markup=content.back_to_about_keyboard
+    )
 
 
 @router.callback_query(F.data == "back_to_about_list")
 async def handle_back_to_list(query: CallbackQuery):
-    sections = [s async for s in AboutSection.objects.all().order_by('order')]
+    content = await content_cache.get()
     
     await query.message.edit_text(
         "Выберите интересующий вас раздел:",
-        reply_markup=get_about_keyboard(sections)
-    )
\ No newline at end of file
+        reply_markup=content.about_keyboard
+    )
@@ -1,17 +1,19 @@
 from aiogram import Router, F, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message, CallbackQuery, FSInputFile
 from web.panel.models import Document, User
+from ..db import run_query
 from ..keyboards import DocumentCallback, get_documents_keyboard
 
 router = Router()
 
 @router.message(F.text == "Мои документы")
 async def handle_my_documents(message: Message, user: User):
-    if not user.department:
+    if not user.department_id:
         await message.answer("Вам еще не назначено подразделение. Обратитесь к HR-менеджеру.")
         return
 
-    documents = [doc async for doc in Document.objects.filter(department=user.department)]
+    documents = await run_query(list, Document.objects.filter(department=user.department_id))
 
     if not documents:
         await message.answer("Для вашего подразделения пока нет документов.")
@@ -26,15 +28,31 @@ async def handle_my_documents(message: Message, user: User):
 async def handle_document_press(query: CallbackQuery, callback_data: DocumentCallback, bot: Bot):
     document_id = callback_data.document_id
     try:
-        document = await Document.objects.aget(id=document_id)
-        
+        document = await run_query(Document.objects.get, id=document_id)
+
+        if document.file_id:
+            try:
+                await bot.send_document(
+                    chat_id=query.from_user.id,
+                    document=document.file_id,
+                    caption=document.description
+                )
+                await query.answer()
+                return
+            except TelegramBadRequest:
+                pass
+
         file_to_send = FSInputFile(document.file.path)
         
-        await bot.send_document(
+        message = await bot.send_document(
             chat_id=query.from_user.id,
             document=file_to_send,
             caption=document.description
         )
+        await run_query(
+            Document.objects.filter(id=document.id, file_hash=document.file_hash).update,
+            file_id=message.document.file_id,
+        )
         await query.answer() 
     except Document.DoesNotExist:
         await query.answer("Ошибка: документ был удален.", show_alert=True)
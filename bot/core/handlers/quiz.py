@@ -1,8 +1,12 @@
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 
-from web.panel.models import User, Quiz, QuizAttempt, Question, Answer, UserAnswer
+from web.panel.models import User, Quiz, QuizAttempt, UserAnswer
+from ..cache import quiz_cache
+from ..db import run_query
 from ..keyboards import get_quizzes_keyboard, QuizCallback, get_answers_keyboard, AnswerCallback
 from ..states import QuizState
 
@@ -11,20 +15,23 @@ router = Router()
 
 @router.message(F.text == "Квизы")
 async def handle_my_quizzes(message: Message, user: User):
-    if not user.department:
+    if not user.department_id:
         await message.answer("Вам еще не назначено подразделение. Обратитесь к HR-менеджеру.")
         return
 
-    quizzes = [quiz async for quiz in Quiz.objects.filter(department=user.department)]
+    quizzes = await run_query(
+        list,
+        Quiz.objects.filter(department_id=user.department_id)
+        .annotate(is_passed=Exists(QuizAttempt.objects.filter(user=user, quiz=OuterRef('pk'))))
+        .only('id', 'title')
+    )
     if not quizzes:
         await message.answer("Для вашего подразделения пока нет тестов.")
         return
 
-    user_attempts = [attempt async for attempt in QuizAttempt.objects.filter(user=user)]
-
     await message.answer(
         "Вот список доступных вам тестов:",
-        reply_markup=get_quizzes_keyboard(quizzes, user_attempts)
+        reply_markup=get_quizzes_keyboard(quizzes)
     )
 
 
@@ -32,25 +39,23 @@ async def handle_my_quizzes(message: Message, user: User):
 async def handle_start_quiz(query: CallbackQuery, callback_data: QuizCallback, state: FSMContext, user: User):
     quiz_id = callback_data.quiz_id
     
-    if await QuizAttempt.objects.filter(user=user, quiz_id=quiz_id).aexists():
+    if await run_query(QuizAttempt.objects.filter(user=user, quiz_id=quiz_id).exists):
         await query.answer("Вы уже проходили этот тест.", show_alert=True)
         return
 
-    questions = [q async for q in Question.objects.filter(quiz_id=quiz_id).order_by('id')]
-    if not questions:
+    quiz = await quiz_cache.get(quiz_id)
+    if not quiz or not quiz.questions:
         await query.answer("В этом тесте пока нет вопросов.", show_alert=True)
         return
 
-    question_ids = [q.id for q in questions]
-
     await state.set_state(QuizState.in_quiz)
-    await state.update_data(
-        quiz_id=quiz_id,
-        question_ids=question_ids,
-        current_question_index=0,
-        score=0,
-        user_answers=[]
-    )
+    await state.set_data({
+        'quiz_id': quiz_id,
+        'quiz_version': quiz.version,
+        'question_ids': list(quiz.questions),
+        'answer_ids': [],
+        'score': 0,
+    })
     
     await query.answer()
     await send_question(query.message, state)
@@ -59,45 +64,40 @@ async def handle_start_quiz(query: CallbackQuery, callback_data: QuizCallback, s
 async def send_question(message: Message, state: FSMContext):
     data = await state.get_data()
     question_ids = data.get("question_ids", [])
-    current_index = data.get("current_question_index", 0)
+    current_index = len(data.get("answer_ids", []))
 
     if current_index >= len(question_ids):
         await finish_quiz(message, state)
         return
 
-    question_id = question_ids[current_index]
-    question = await Question.objects.aget(id=question_id)
-    answers = [ans async for ans in Answer.objects.filter(question_id=question_id)]
+    quiz = await quiz_cache.get(data["quiz_id"], data.get("quiz_version"))
+    question = quiz.questions.get(question_ids[current_index]) if quiz else None
+    if question is None:
+        await finish_quiz(message, state)
+        return
     
     await message.answer(
         f"Вопрос {current_index + 1}/{len(question_ids)}:\n\n{question.text}",
-        reply_markup=get_answers_keyboard(answers)
+        reply_markup=get_answers_keyboard(question.answers)
     )
 
 
 @router.callback_query(AnswerCallback.filter(), QuizState.in_quiz)
 async def handle_answer(query: CallbackQuery, callback_data: AnswerCallback, state: FSMContext):
-    answer_id = callback_data.answer_id
-    answer = await Answer.objects.select_related('question').aget(id=answer_id)
-    
     data = await state.get_data()
-    score = data.get("score", 0)
-    user_answers = data.get("user_answers", [])
+    question_ids = data.get("question_ids", [])
+    answer_ids = data.get("answer_ids", [])
 
-    user_answers.append({
-        'question_id': answer.question.id,
-        'answer_id': answer.id
-    })
+    quiz = await quiz_cache.get(data["quiz_id"], data.get("quiz_version"))
+    answer = quiz.answers.get(callback_data.answer_id) if quiz else None
+    if answer is None or len(answer_ids) >= len(question_ids) or answer.question_id != question_ids[len(answer_ids)]:
+        await query.answer()
+        return
 
-    if answer.is_correct:
-        score += 1
-        
-    current_index = data.get("current_question_index", 0)
-    await state.update_data(
-        score=score,
-        current_question_index=current_index + 1,
-        user_answers=user_answers
-    )
+    answer_ids.append(answer.id)
+    score = data.get("score", 0) + int(answer.is_correct)
+
+    await state.update_data(score=score, answer_ids=answer_ids)
 
     await query.message.delete()
     await query.answer()
@@ -105,26 +105,27 @@ async def handle_answer(query: CallbackQuery, callback_data: AnswerCallback, sta
     await send_question(query.message, state)
 
 
+@transaction.atomic
+def save_attempt(user_id: int, quiz_id: int, score: int, answers):
+    attempt = QuizAttempt.objects.create(user_id=user_id, quiz_id=quiz_id, score=score)
+    UserAnswer.objects.bulk_create(
+        UserAnswer(attempt=attempt, question_id=question_id, answer_id=answer_id)
+        for question_id, answer_id in answers
+    )
+
+
 async def finish_quiz(message: Message, state: FSMContext):
     data = await state.get_data()
     user_id = message.chat.id
     
-    attempt = await QuizAttempt.objects.acreate(
-        user_id=user_id,
-        quiz_id=data.get("quiz_id"),
-        score=data.get("score", 0)
+    await run_query(
+        save_attempt,
+        user_id,
+        data.get("quiz_id"),
+        data.get("score", 0),
+        zip(data.get("question_ids", []), data.get("answer_ids", [])),
     )
 
-    user_answers_to_create = [
-        UserAnswer(
-            attempt=attempt,
-            question_id=ans['question_id'],
-            answer_id=ans['answer_id']
-        )
-        for ans in data.get("user_answers", [])
-    ]
-    await UserAnswer.objects.abulk_create(user_answers_to_create)
-
     total_questions = len(data.get("question_ids", []))
     score = data.get("score", 0)
 
@@ -29,14 +29,11 @@ def get_documents_keyboard(documents) -> InlineKeyboardMarkup:
 class QuizCallback(CallbackData, prefix="quiz"):
     quiz_id: int
 
-def get_quizzes_keyboard(quizzes, user_attempts) -> InlineKeyboardMarkup:
+def get_quizzes_keyboard(quizzes) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    
-    attempts_map = {attempt.quiz_id: attempt for attempt in user_attempts}
 
     for quiz in quizzes:
-        attempt = attempts_map.get(quiz.id)
-        if attempt:
+        if quiz.is_passed:
             status = "✅ Пройден"
         else:
             status = "❌ Не пройден"
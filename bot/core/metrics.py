@@ -0,0 +1,126 @@
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+from django.db.backends.signals import connection_created
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+DB_QUERY_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50, 100)
+
+UPDATES = Counter('bot_updates_total', 'Updates processed by the bot', ['router', 'handler', 'status'])
+UPDATES_IN_FLIGHT = Gauge('bot_updates_in_flight', 'Updates being processed right now')
+UPDATE_DURATION = Histogram('bot_update_duration_seconds', 'Time spent on an update, middlewares included',
+                            ['router', 'handler'])
+UPDATE_DB_QUERIES = Histogram('bot_update_db_queries', 'SQL queries made while processing an update',
+                              ['router', 'handler'], buckets=DB_QUERY_BUCKETS)
+UPDATE_DB_DURATION = Histogram('bot_update_db_duration_seconds', 'Time spent in the database per update',
+                               ['router', 'handler'])
+API_REQUEST_DURATION = Histogram('bot_api_request_duration_seconds', 'Latency of Bot API requests', ['method'])
+API_ERRORS = Counter('bot_api_errors_total', 'Failed Bot API requests', ['method', 'error'])
+
+
+@dataclass
+class UpdateStats:
+    router: str = '-'
+    handler: str = 'unhandled'
+    queries: int = 0
+    db_time: float = 0.0
+
+
+# sync_to_async copies the context into its thread, so queries made there see the update they belong to.
+_current_update: ContextVar[UpdateStats | None] = ContextVar('current_update', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current_update.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started_at
+
+
+def _instrument_connection(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Outer middleware: times the whole update and reports it under the handler that took it."""
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        stats = UpdateStats()
+        token = _current_update.set(stats)
+        started_at = time.perf_counter()
+        status = 'ok'
+        UPDATES_IN_FLIGHT.inc()
+        try:
+            return await handler(event, data)
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            UPDATES_IN_FLIGHT.dec()
+            _current_update.reset(token)
+            UPDATES.labels(stats.router, stats.handler, status).inc()
+            UPDATE_DURATION.labels(stats.router, stats.handler).observe(time.perf_counter() - started_at)
+            UPDATE_DB_QUERIES.labels(stats.router, stats.handler).observe(stats.queries)
+            UPDATE_DB_DURATION.labels(stats.router, stats.handler).observe(stats.db_time)
+
+
+class HandlerLabelMiddleware(BaseMiddleware):
+    """Inner middleware: tells :class:`MetricsMiddleware` which router and handler took the update."""
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        stats = _current_update.get()
+        if stats is not None:
+            callback = data['handler'].callback
+            stats.router = callback.__module__.rsplit('.', 1)[-1]
+            stats.handler = callback.__name__
+        return await handler(event, data)
+
+
+class BotAPIMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        name = method.__api_method__
+        started_at = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as e:
+            API_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            API_REQUEST_DURATION.labels(name).observe(time.perf_counter() - started_at)
+
+
+def setup_metrics(port: int | None = config.METRICS_PORT):
+    """Starts counting DB queries and serves ``/metrics`` on ``port`` (nothing is served when it is not set)."""
+    connection_created.connect(_instrument_connection, weak=False, dispatch_uid='bot_metrics')
+    if port:
+        start_http_server(port, addr=config.METRICS_HOST)
+        logger.info('Metrics are served on %s:%s', config.METRICS_HOST, port)
@@ -1,9 +1,18 @@
 from typing import Callable, Dict, Any, Awaitable
-from aiogram import BaseMiddleware
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
 from aiogram.types import Message, CallbackQuery
 from web.panel.models import User
+from web.panel.ratelimit import AsyncRateCoordinator, message_cost
+from .cache import CachedUser, UserCache, user_cache
+from .db import run_query
 
 class UserMiddleware(BaseMiddleware):
+    def __init__(self, cache: UserCache = user_cache):
+        self.cache = cache
+
     async def __call__(
             self,
             handler: Callable[[Message | CallbackQuery, Dict[str, Any]], Awaitable[Any]],
@@ -12,24 +21,46 @@ class UserMiddleware(BaseMiddleware):
     ) -> Any:
         from_user = event.from_user
 
-        try:
-            user = await User.objects.select_related("department").aget(id=from_user.id)
-            created = False
-        except User.DoesNotExist:
-            user, created = await User.objects.aget_or_create(id=from_user.id)
-
-        if created:
-            user.username = from_user.username
-            user.first_name = from_user.first_name
-            user.last_name = from_user.last_name
-            await user.asave()
-            await event.answer("Здравствуйте! Ваша заявка на доступ принята и ожидает подтверждения от HR-менеджера.")
-            return
+        user = await self.cache.get(from_user.id)
+
+        if user is None:
+            new_user, created = await run_query(
+                User.objects.get_or_create,
+                id=from_user.id,
+                defaults={
+                    'username': from_user.username,
+                    'first_name': from_user.first_name,
+                    'last_name': from_user.last_name,
+                },
+            )
+            if created:
+                await event.answer("Здравствуйте! Ваша заявка на доступ принята и ожидает подтверждения от HR-менеджера.")
+                return
+            user = self.cache.set(
+                CachedUser(new_user.id, new_user.is_active, new_user.department_id, new_user.first_name)
+            )
         
         if not user.is_active:
             await event.answer("Ваш доступ все еще ожидает подтверждения. Пожалуйста, ожидайте.",
                                show_alert=isinstance(event, CallbackQuery))
             return
 
-        data['user'] = user
-        return await handler(event, data)
\ No newline at end of file
+        data['user'] = user.as_user()
+        return await handler(event, data)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Takes the bot's messages out of the budgets shared with the Celery worker, ahead of its bulk sends."""
+
+    def __init__(self):
+        self.coordinator = AsyncRateCoordinator(interactive=True)
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        cost = message_cost(method.__api_method__, getattr(method, 'media', None))
+        if cost:
+            await self.coordinator.acquire(getattr(method, 'chat_id', None), cost)
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as e:
+            await self.coordinator.pause(e.retry_after)
+            raise
@@ -0,0 +1,30 @@
+import json
+from functools import partial
+
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from django.conf import settings
+
+from config import config
+
+_json_dumps = partial(json.dumps, separators=(',', ':'))
+
+
+def create_storage() -> BaseStorage:
+    if config.FSM_STORAGE != 'redis':
+        return MemoryStorage()
+
+    return RedisStorage.from_url(
+        f'{settings.REDIS_URL}/{config.FSM_REDIS_DB}',
+        state_ttl=config.FSM_TTL,
+        data_ttl=config.FSM_TTL,
+        json_dumps=_json_dumps,
+    )
+
+
+def create_events_isolation(storage: BaseStorage) -> BaseEventIsolation | None:
+    # Several bot replicas must not handle updates of the same user at the same time.
+    if isinstance(storage, RedisStorage):
+        return storage.create_isolation()
+    return None
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import SyncToAsync
+from prometheus_client import Counter, Gauge, Histogram
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LOOP_LAG = Histogram('bot_event_loop_lag_seconds', 'How late the event loop wakes up a sleeping task',
+                     buckets=LAG_BUCKETS)
+LOOP_BLOCKS = Counter('bot_event_loop_blocks_total', 'Times the event loop was blocked longer than the threshold')
+EXECUTOR_THREADS = Gauge('bot_executor_threads', 'Threads of the executor', ['executor'])
+EXECUTOR_QUEUE = Gauge('bot_executor_queue_depth', 'Calls waiting for a free thread of the executor', ['executor'])
+EXECUTOR_ACTIVE = Gauge('bot_executor_active_calls', 'Calls running in the executor', ['executor'])
+EXECUTOR_WAIT = Histogram('bot_executor_wait_seconds', 'Time a call waits for a free thread', ['executor'],
+                          buckets=LAG_BUCKETS)
+EXECUTOR_BUSY = Counter('bot_executor_busy_seconds', 'Time the threads of the executor spent running calls',
+                        ['executor'])
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """Reports queue depth, waiting and busy time of its calls under ``name``."""
+
+    def __init__(self, name: str, max_workers: int, **kwargs):
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.name = name
+        EXECUTOR_THREADS.labels(name).set(max_workers)
+
+    def submit(self, fn, /, *args, **kwargs):
+        queued = EXECUTOR_QUEUE.labels(self.name)
+        active = EXECUTOR_ACTIVE.labels(self.name)
+        submitted_at = time.perf_counter()
+
+        def run():
+            started_at = time.perf_counter()
+            queued.dec()
+            active.inc()
+            EXECUTOR_WAIT.labels(self.name).observe(started_at - submitted_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                active.dec()
+                EXECUTOR_BUSY.labels(self.name).inc(time.perf_counter() - started_at)
+
+        queued.inc()
+        try:
+            return super().submit(run)
+        except RuntimeError:
+            queued.dec()
+            raise
+
+
+def instrument_django_executor():
+    """Swaps the single thread that runs ``sync_to_async`` calls by default for an instrumented one."""
+    if not isinstance(SyncToAsync.single_thread_executor, InstrumentedExecutor):
+        SyncToAsync.single_thread_executor = InstrumentedExecutor('django', max_workers=1)
+
+
+class LoopWatchdog:
+    """Samples the event loop lag from a task and catches a blocked loop from a separate thread.
+
+    When the loop does not wake up the sampler for longer than ``threshold`` seconds,
+    the stack of the loop thread is logged, it points at the callback that blocks it.
+    """
+
+    def __init__(self, interval: float = config.WATCHDOG_INTERVAL, threshold: float = config.WATCHDOG_BLOCK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self._heartbeat = 0.0
+        self._loop_thread_id = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    async def start(self):
+        instrument_django_executor()
+        if not self.interval:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        if self.threshold:
+            self._thread = threading.Thread(target=self._watch, name='bot-watchdog', daemon=True)
+            self._thread.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - expected))
+            self._heartbeat = time.monotonic()
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.threshold or heartbeat == reported:
+                continue
+            # One report per stall, the heartbeat moves once the loop is free again.
+            reported = heartbeat
+            LOOP_BLOCKS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else 'unavailable'
+            logger.warning('Event loop is blocked for %.2f s, the loop thread is at:\n%s', blocked, stack)
+
+
+watchdog = LoopWatchdog()
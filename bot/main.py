@@ -12,18 +12,28 @@ from aiogram import Bot, Dispatcher
 from config import config
 import asyncio
 
-from core.middlewares import UserMiddleware
+from core.cache import start_invalidation_listener, stop_invalidation_listener, warm_content_cache
+from core.metrics import BotAPIMetricsMiddleware, HandlerLabelMiddleware, MetricsMiddleware, setup_metrics
+from core.middlewares import RateLimitMiddleware, UserMiddleware
+from core.storage import create_storage, create_events_isolation
+from core.watchdog import watchdog
 from core.handlers import start, menu, quiz, info, help
 from aiogram.utils.callback_answer import CallbackAnswerMiddleware
 
 
-async def main():
-    bot = Bot(token=config.BOT_TOKEN)
-
-    dp = Dispatcher()
+def create_dispatcher() -> Dispatcher:
+    storage = create_storage()
+    dp = Dispatcher(storage=storage, events_isolation=create_events_isolation(storage))
+    user_middleware = UserMiddleware()
+    metrics_middleware = MetricsMiddleware()
+    handler_label_middleware = HandlerLabelMiddleware()
+    dp.callback_query.outer_middleware(metrics_middleware)
     dp.callback_query.outer_middleware(CallbackAnswerMiddleware())
-    dp.callback_query.outer_middleware(UserMiddleware())
-    dp.message.outer_middleware(UserMiddleware())
+    dp.callback_query.outer_middleware(user_middleware)
+    dp.callback_query.middleware(handler_label_middleware)
+    dp.message.outer_middleware(metrics_middleware)
+    dp.message.outer_middleware(user_middleware)
+    dp.message.middleware(handler_label_middleware)
     dp.include_routers(
         start.router,
         menu.router,
@@ -31,6 +41,22 @@ async def main():
         info.router,
         help.router,
     )
+    dp.startup.register(watchdog.start)
+    dp.startup.register(start_invalidation_listener)
+    dp.startup.register(warm_content_cache)
+    dp.shutdown.register(stop_invalidation_listener)
+    dp.shutdown.register(watchdog.stop)
+    return dp
+
+
+async def main():
+    bot = Bot(token=config.BOT_TOKEN)
+    if config.TELEGRAM_RATE_LIMIT:
+        bot.session.middleware(RateLimitMiddleware())
+    bot.session.middleware(BotAPIMetricsMiddleware())
+    setup_metrics()
+
+    dp = create_dispatcher()
 
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import multiprocessing
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from main import create_dispatcher
+from config import config
+from core.metrics import BotAPIMetricsMiddleware, setup_metrics
+from core.middlewares import RateLimitMiddleware
+
+
+async def set_webhook(allowed_updates: list[str]):
+    bot = Bot(token=config.BOT_TOKEN)
+    try:
+        await bot.set_webhook(
+            url=f'{config.WEBHOOK_URL.rstrip("/")}{config.WEBHOOK_PATH}',
+            secret_token=config.WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+            max_connections=max(40, config.BOT_WORKERS * 20),
+        )
+    finally:
+        await bot.session.close()
+
+
+def run_worker(dp: Dispatcher, index: int = 0):
+    logging.basicConfig(level=logging.INFO)
+    # Every worker has its own registry, so each one serves it on its own port.
+    setup_metrics(config.METRICS_PORT and config.METRICS_PORT + index)
+
+    bot = Bot(token=config.BOT_TOKEN)
+    if config.TELEGRAM_RATE_LIMIT:
+        bot.session.middleware(RateLimitMiddleware())
+    bot.session.middleware(BotAPIMetricsMiddleware())
+
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=config.WEBHOOK_SECRET).register(
+        app, path=config.WEBHOOK_PATH
+    )
+    setup_application(app, dp, bot=bot)
+
+    # Every worker binds the same port, the kernel spreads incoming connections between them.
+    web.run_app(app, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT, reuse_port=True, print=None)
+
+
+def main():
+    if not config.WEBHOOK_URL:
+        raise SystemExit('WEBHOOK_URL is not set')
+    if config.BOT_WORKERS > 1 and config.FSM_STORAGE != 'redis':
+        raise SystemExit('Several bot workers need a shared FSM storage, set FSM_STORAGE=redis')
+
+    dp = create_dispatcher()
+    asyncio.run(set_webhook(dp.resolve_used_update_types()))
+
+    if config.BOT_WORKERS == 1:
+        run_worker(dp)
+        return
+
+    # Workers are forked so that they inherit the configured dispatcher instead of rebuilding the routers.
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=run_worker, args=(dp, index)) for index in range(config.BOT_WORKERS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == '__main__':
+    main()
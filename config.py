@@ -18,8 +18,42 @@ class Config(BaseSettings):
 
     REDIS_HOST: str
     REDIS_PORT: str
+
+    WEBHOOK_URL: str | None = None
+    WEBHOOK_PATH: str = '/bot/webhook'
+    WEBHOOK_SECRET: str | None = None
+    WEBHOOK_HOST: str = '0.0.0.0'
+    WEBHOOK_PORT: int = 8081
+    BOT_WORKERS: int = 1
+
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_SIZE: int = 10000
+    BOT_DB_THREADS: int = 8
+    DB_CONN_MAX_AGE: int = 60
+    WATCHDOG_INTERVAL: float = 0.25
+    WATCHDOG_BLOCK_THRESHOLD: float = 1.0
+
+    FSM_STORAGE: str = 'memory'
+    FSM_REDIS_DB: int = 1
+    FSM_TTL: int = 60 * 60 * 24
+
+    METRICS_HOST: str = '0.0.0.0'
+    METRICS_PORT: int | None = 9100
+    CELERY_METRICS_PORT: int | None = 9101
+    CELERY_METRICS_URL: str | None = (
+        'http://celery_broadcast:9101/metrics,http://celery_worker:9101/metrics,http://celery_scheduled:9101/metrics'
+    )
+    OUTBOX_RELAY_INTERVAL: float = 5.0
+    NOTIFICATION_DIGEST_WINDOW: int = 300
     
     BOT_NAME: str
+    SERVICE_CHAT_ID: int | None = None
+    TELEGRAM_API_URL: str = 'https://api.telegram.org'
+    TELEGRAM_RATE_LIMIT: bool = True
+    TELEGRAM_GLOBAL_RATE: float = 30
+    TELEGRAM_CHAT_RATE: float = 1
+    TELEGRAM_CHAT_BURST: int = 3
+    TELEGRAM_INTERACTIVE_RESERVE: int = 5
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,153 @@
+"""End-to-end load benchmark of one bot process.
+
+Virtual employees go through the menu, open documents and pass quizzes. Their updates are fed
+concurrently into the dispatcher from ``bot/main.py`` (middlewares and all routers included),
+which talks to :mod:`perf.fake_telegram` instead of Telegram. Throughput and latency
+percentiles per handler are printed and saved under the current git commit.
+
+    python -m perf.bot_load --users 100 --rounds 5 --api-latency 30 [--compare COMMIT]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from collections import defaultdict
+
+from perf.fake_telegram import FakeTelegram
+from perf.harness import (
+    QueryRecorder, callback_update, load_results, message_update, percentiles, save_results, seed, setup_django,
+    test_database,
+)
+
+RESULTS_NAME = 'bot_load'
+
+recorder = QueryRecorder()
+
+
+async def load_quiz_answers(quizzes) -> dict[int, list[int]]:
+    """Returns the ids of the first answer of every question, per quiz."""
+    from web.panel.models import Answer
+
+    answers = defaultdict(list)
+    rows = Answer.objects.filter(question__quiz__in=quizzes).order_by('question_id', 'id').values_list(
+        'question__quiz_id', 'question_id', 'id'
+    )
+    seen = set()
+    async for quiz_id, question_id, answer_id in rows:
+        if question_id not in seen:
+            seen.add(question_id)
+            answers[quiz_id].append(answer_id)
+    return answers
+
+
+async def run_load(data, api_url: str, rounds: int) -> dict:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from main import create_dispatcher
+    from core.keyboards import AnswerCallback, DocumentCallback, QuizCallback
+
+    dp = create_dispatcher()
+    bot = Bot(token='42:perf', session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+
+    users, documents, quizzes = data['users'], data['documents'], data['quizzes']
+    answers = await load_quiz_answers(quizzes)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    async def feed(label: str, update):
+        started_at = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            errors[label] += 1
+        latencies[label].append((time.perf_counter() - started_at) * 1000)
+
+    async def employee(index: int, user_id: int):
+        for round_ in range(rounds):
+            # Employee ``index`` has already passed quiz ``index - 1``, see ``seed``.
+            quiz = quizzes[(index + 1 + round_) % len(quizzes)]
+            document = documents[(index + round_) % len(documents)]
+
+            await feed('menu', message_update(user_id, '/start'))
+            await feed('documents', message_update(user_id, 'Мои документы'))
+            await feed('document', callback_update(user_id, DocumentCallback(document_id=document.id).pack()))
+            await feed('quizzes', message_update(user_id, 'Квизы'))
+            await feed('start-quiz', callback_update(user_id, QuizCallback(quiz_id=quiz.id).pack()))
+            for answer_id in answers[quiz.id]:
+                await feed('answer', callback_update(user_id, AnswerCallback(answer_id=answer_id).pack()))
+
+    with recorder.measure() as stats:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(employee(index, user.id) for index, user in enumerate(users)))
+        elapsed = time.perf_counter() - started_at
+
+    await bot.session.close()
+
+    updates = sum(len(samples) for samples in latencies.values())
+    return {
+        'updates': updates,
+        'elapsed': elapsed,
+        'throughput': updates / elapsed,
+        'queries_per_update': stats.count / updates,
+        'handlers': {
+            label: {'count': len(samples), 'errors': errors[label], **percentiles(samples)}
+            for label, samples in latencies.items()
+        },
+    }
+
+
+def print_results(results: dict, previous: dict | None, previous_commit: str | None):
+    print(f'\n{results["updates"]} updates in {results["elapsed"]:.2f} s: {results["throughput"]:.1f} updates/s, '
+          f'{results["queries_per_update"]:.2f} queries per update')
+    if previous:
+        change = (results['throughput'] / previous['throughput'] - 1) * 100
+        print(f'{previous_commit}: {previous["throughput"]:.1f} updates/s ({change:+.1f}%)')
+
+    print(f'\n{"handler":<12} {"count":>7} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for label, result in results['handlers'].items():
+        line = (f'{label:<12} {result["count"]:>7} {result["errors"]:>7} '
+                f'{result["p50"]:>8.2f} {result["p95"]:>8.2f} {result["p99"]:>8.2f}')
+        if previous and label in previous['handlers']:
+            line += f'   was p95 {previous["handlers"][label]["p95"]:.2f}'
+        print(line)
+
+
+async def benchmark(args) -> dict:
+    async with FakeTelegram(latency=args.api_latency / 1000) as server:
+        return await run_load(args.data, server.url, args.rounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures how many updates per second one bot process handles.')
+    parser.add_argument('--users', type=int, default=50, help='Concurrent virtual employees')
+    parser.add_argument('--rounds', type=int, default=5, help='Passes through the menu and a quiz per employee')
+    parser.add_argument('--api-latency', type=float, default=0, help='Delay of the fake Bot API in milliseconds')
+    parser.add_argument('--compare', metavar='COMMIT', help='Compare with the saved results of this commit')
+    parser.add_argument('--no-save', action='store_true', help='Do not save the results')
+    args = parser.parse_args()
+
+    if args.users < args.rounds + 2:
+        parser.error('--users must be at least --rounds + 2, every round needs a quiz the employee has not passed')
+
+    setup_django()
+    recorder.install()
+
+    with test_database():
+        args.data = seed(args.users)
+        results = asyncio.run(benchmark(args))
+
+    results['params'] = {'users': args.users, 'rounds': args.rounds, 'api_latency': args.api_latency}
+    history = load_results(RESULTS_NAME)
+    print_results(results, history.get(args.compare), args.compare)
+
+    if not args.no_save:
+        commit = save_results(RESULTS_NAME, results)
+        print(f'\nSaved as {commit} in perf/results/{RESULTS_NAME}.json')
+
+    if any(result['errors'] for result in results['handlers'].values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
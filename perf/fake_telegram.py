@@ -0,0 +1,170 @@
+"""A local stand-in for the Telegram Bot API.
+
+Answers every method the bot and the Celery tasks use with a plausible result after a
+configurable delay, and counts the calls per method. It can also throttle every N-th request
+with a 429 and answer 403 for blocked chats.
+
+    python -m perf.fake_telegram --port 8082 --latency 30 --flood-every 500 --retry-after 1
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from itertools import count
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    def __init__(self, latency: float = 0.0, flood_every: int = 0, retry_after: int = 1,
+                 blocked_chats: set[int] = frozenset()):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.blocked_chats = blocked_chats
+        self.requests = 0
+        self.calls = Counter()
+        self.errors = Counter()
+        self.message_ids = count(1)
+        self.runner: web.AppRunner | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.thread: threading.Thread | None = None
+        self.url = ''
+
+        self.app = web.Application(client_max_size=50 * 1024 ** 2)
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://{host}:{port}'
+        return self
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def read_params(self, request: web.Request) -> dict:
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            params[key] = value if isinstance(value, str) else '<file>'
+        return params
+
+    def reset(self):
+        self.requests = 0
+        self.calls.clear()
+        self.errors.clear()
+
+    def error(self, error_code: int, description: str, **parameters):
+        self.errors[error_code] += 1
+        body = {'ok': False, 'error_code': error_code, 'description': description}
+        if parameters:
+            body['parameters'] = parameters
+        return web.json_response(body, status=error_code)
+
+    async def handle(self, request: web.Request):
+        method = request.match_info['method']
+        params = await self.read_params(request)
+        self.requests += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.flood_every and self.requests % self.flood_every == 0:
+            return self.error(429, f'Too Many Requests: retry after {self.retry_after}', retry_after=self.retry_after)
+        if int(params.get('chat_id', 0)) in self.blocked_chats:
+            return self.error(403, 'Forbidden: bot was blocked by the user')
+
+        self.calls[method] += 1
+        return web.json_response({'ok': True, 'result': self.result(method, params)})
+
+    def start_in_thread(self, host: str = '127.0.0.1', port: int = 0):
+        """Serves from a background thread, for callers that are synchronous such as Celery tasks."""
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.start(host, port))
+            started.set()
+            self.loop.run_forever()
+            self.loop.run_until_complete(self.stop())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def message(self, method: str, params: dict, media_type: str | None = None) -> dict:
+        message = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+        }
+        file = {'file_id': f'fake-{method}-{message["message_id"]}', 'file_unique_id': f'u{message["message_id"]}'}
+        if media_type == 'photo':
+            message['photo'] = [{**file, 'width': 1, 'height': 1}]
+        elif media_type == 'video':
+            message['video'] = {**file, 'width': 1, 'height': 1, 'duration': 1}
+        elif media_type == 'document':
+            message['document'] = file
+        else:
+            message['text'] = params.get('text', '')
+        return message
+
+    def result(self, method: str, params: dict):
+        if method == 'getMe':
+            return {'id': 42, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        if method == 'sendMediaGroup':
+            media = params['media']
+            media = json.loads(media) if isinstance(media, str) else media
+            return [self.message(method, params, item['type']) for item in media]
+        if method in ('sendPhoto', 'sendVideo', 'sendDocument'):
+            return self.message(method, params, method[4:].lower())
+        if method.startswith(('send', 'edit', 'copy', 'forward')):
+            return self.message(method, params)
+        return True
+
+
+async def serve(host: str, port: int, **options):
+    server = await FakeTelegram(**options).start(host, port)
+    print(f'Fake Bot API on {server.url}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs a local stand-in for the Telegram Bot API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0, help='Delay of every answer in milliseconds')
+    parser.add_argument('--flood-every', type=int, default=0, help='Answer every N-th request with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after of the 429 answers, in seconds')
+    parser.add_argument('--blocked', type=int, nargs='*', default=[], help='Chat ids answered with 403')
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, latency=args.latency / 1000, flood_every=args.flood_every,
+                      retry_after=args.retry_after, blocked_chats=set(args.blocked)))
+
+
+if __name__ == '__main__':
+    main()
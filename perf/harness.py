@@ -0,0 +1,278 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / 'perf' / 'results'
+
+
+def setup_django():
+    for path in (ROOT, ROOT / 'bot'):
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web.core.settings')
+
+    import django
+    django.setup()
+
+
+def git_commit() -> str:
+    """Short hash of HEAD, marked ``-dirty`` when the working tree has changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD', '--', '.', ':!perf/results'], cwd=ROOT).returncode
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+
+def load_results(name: str) -> dict:
+    path = RESULTS_DIR / f'{name}.json'
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_results(name: str, results: dict) -> str:
+    """Stores ``results`` of a benchmark under the current commit, next to the ones of earlier commits."""
+    commit = git_commit()
+    history = load_results(name)
+    history[commit] = results
+    RESULTS_DIR.mkdir(exist_ok=True)
+    (RESULTS_DIR / f'{name}.json').write_text(json.dumps(history, indent=2, ensure_ascii=False))
+    return commit
+
+
+def percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    return {
+        f'p{p}': samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+        for p in (50, 95, 99)
+    }
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    time: float = 0.0
+
+
+class QueryRecorder:
+    """Counts queries and their time on every connection, including the ones opened by ``sync_to_async`` threads."""
+
+    def __init__(self):
+        self.stats = QueryStats()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self.lock:
+                self.stats.count += 1
+                self.stats.time += elapsed
+
+    def install(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        def wrap(connection, **kwargs):
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+
+        connection_created.connect(wrap, weak=False)
+        for connection in connections.all(initialized_only=True):
+            wrap(connection)
+
+    @contextmanager
+    def measure(self):
+        stats = self.stats = QueryStats()
+        yield stats
+        self.stats = QueryStats()
+
+
+@contextmanager
+def test_database():
+    """Creates a throwaway database from the current models and drops it afterwards."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    test_settings['MIGRATE'] = False
+    if connection.vendor == 'sqlite':
+        # The bot queries from worker threads, an in-memory database would be empty there.
+        test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'perf.sqlite3')
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def no_side_effects():
+    """Keeps signal handlers from writing outbox rows and digest items and from publishing
+    cache invalidations while seeding.
+
+    Seeded mailings, documents and quizzes would otherwise be relayed to Celery or land in the
+    notification digest that ``perf.mailing`` measures.
+    """
+    from django.db import transaction
+    from web.panel import digest, outbox
+    from web.panel.models import NotificationDigestItem, OutboxMessage
+
+    def written() -> tuple[int, int]:
+        return OutboxMessage.objects.count(), NotificationDigestItem.objects.count()
+
+    before = written()
+    with (
+        mock.patch.object(outbox, 'enqueue'),
+        mock.patch.object(digest, 'add'),
+        mock.patch.object(transaction, 'on_commit'),
+    ):
+        yield
+    # A signal that writes them some other way has to be patched above as well.
+    assert written() == before, 'seeding wrote outbox rows or digest items'
+
+
+def create_fake_session():
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Chat, Message
+
+    class FakeSession(BaseSession):
+        """Answers every Bot API call locally and remembers the methods that were called."""
+
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls.append(type(method).__name__)
+            if method.__returning__ is not Message:
+                return True
+            chat = Chat(id=getattr(method, 'chat_id', 0), type='private')
+            return Message(message_id=len(self.calls), date=datetime.now(), chat=chat).as_(bot)
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b''
+
+        async def close(self):
+            pass
+
+    return FakeSession()
+
+
+_update_id = 0
+
+
+def _next_update_id() -> int:
+    global _update_id
+    _update_id += 1
+    return _update_id
+
+
+def message_update(user_id: int, text: str):
+    from aiogram.types import Chat, Message, Update, User
+
+    user = User(id=user_id, is_bot=False, first_name='Perf', username=f'perf{user_id}')
+    message = Message(
+        message_id=_next_update_id(),
+        date=datetime.now(),
+        chat=Chat(id=user_id, type='private'),
+        from_user=user,
+        text=text,
+    )
+    return Update(update_id=_update_id, message=message)
+
+
+def callback_update(user_id: int, data: str):
+    from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+    user = User(id=user_id, is_bot=False, first_name='Perf', username=f'perf{user_id}')
+    message = Message(message_id=_next_update_id(), date=datetime.now(), chat=Chat(id=user_id, type='private'))
+    query = CallbackQuery(id=str(_update_id), from_user=user, chat_instance='perf', message=message, data=data)
+    return Update(update_id=_update_id, callback_query=query)
+
+
+_seeded = 0
+
+
+def seed(size: int) -> dict:
+    """Adds a department with ``size`` employees, documents, quizzes, attempts and mailings.
+
+    Can be called repeatedly, every call adds a new batch of rows.
+    """
+    from django.utils import timezone
+    from web.panel.models import (
+        AboutSection, Answer, Department, Document, HelpButton, HelpPart, Mailing, MailingDelivery, Question,
+        Quiz, QuizAttempt, User, UserAnswer,
+    )
+
+    global _seeded
+    _seeded += 1
+    batch = _seeded
+
+    with no_side_effects():
+        department = Department.objects.create(name=f'Отдел {batch}')
+        users = [
+            User.objects.create(id=batch * 100_000 + i, username=f'user{batch}_{i}', first_name='Сотрудник',
+                                department=department, is_active=True)
+            for i in range(size)
+        ]
+
+        documents = []
+        quizzes = []
+        for i in range(size):
+            document = Document.objects.create(title=f'Документ {batch}.{i}', file='documents/perf.txt',
+                                               file_id=f'perf-file-{batch}-{i}')
+            document.department.add(department)
+            documents.append(document)
+
+            quiz = Quiz.objects.create(title=f'Квиз {batch}.{i}', document=document, department=department)
+            for q in range(3):
+                question = Question.objects.create(quiz=quiz, text=f'Вопрос {q + 1}')
+                for a in range(3):
+                    Answer.objects.create(question=question, text=f'Ответ {a + 1}', is_correct=a == 0)
+            quizzes.append(quiz)
+
+        # Every employee but the first has passed one quiz, the first one is left for the bot scenarios.
+        for user, quiz in zip(users[1:], quizzes):
+            attempt = QuizAttempt.objects.create(user=user, quiz=quiz, score=2)
+            UserAnswer.objects.bulk_create(
+                UserAnswer(attempt=attempt, question=question, answer=question.answers.first())
+                for question in quiz.questions.all()
+            )
+
+        for i in range(size):
+            mailing = Mailing.objects.create(text=f'Рассылка {batch}.{i}', datetime=timezone.now(), is_ok=True)
+            mailing.departments.add(department)
+            MailingDelivery.objects.bulk_create(
+                MailingDelivery(mailing=mailing, user=user, status='sent', attempts=1) for user in users
+            )
+
+        AboutSection.objects.bulk_create(
+            AboutSection(title=f'Раздел {batch}.{i}', text='Текст', order=i) for i in range(size)
+        )
+        HelpButton.objects.bulk_create(
+            HelpButton(text_on_btn=f'Кнопка {batch}.{i}', url='https://example.com') for i in range(size)
+        )
+        HelpPart.objects.get_or_create(id=1, defaults={'text_on_message': 'Помощь'})
+
+    return {'department': department, 'users': users, 'documents': documents, 'quizzes': quizzes}
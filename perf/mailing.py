@@ -0,0 +1,178 @@
+"""Throughput benchmark of the Celery send path.
+
+Runs ``send_mailing`` (text, photo and album mailings), ``send_notification_digest``
+(a document and three quizzes) and ``send_daily_quiz_reminders`` against :mod:`perf.fake_telegram`
+for every recipient count, and reports messages per second, wall time and DB queries.
+Results are saved under the current git commit.
+
+    python -m perf.mailing --recipients 1000 10000 50000 --latency 30 --blocked-share 0.01 --flood-every 1000
+
+The tasks keep their production pacing, so the larger runs take a while.
+"""
+import argparse
+import logging
+import tempfile
+import time
+
+from perf.fake_telegram import FakeTelegram
+from perf.harness import QueryRecorder, load_results, no_side_effects, save_results, setup_django, test_database
+
+RESULTS_NAME = 'mailing'
+TASKS = (
+    'mailing-text', 'mailing-photo', 'mailing-album', 'notify-digest', 'reminders',
+)
+
+# The smallest valid GIF, good enough for photo uploads to the fake API.
+IMAGE = b'GIF89a\x01\x00\x01\x00\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x00;'
+
+recorder = QueryRecorder()
+
+
+def seed_recipients(recipients: int) -> dict:
+    """Adds a department of ``recipients`` active employees, the employees of earlier runs are deactivated."""
+    from django.core.files.base import ContentFile
+    from django.db.models import Max
+    from django.utils import timezone
+    from web.panel.models import Attachments, Department, Document, Mailing, Quiz, User
+    from web.panel.progress import refresh_quiz_progress
+
+    first_id = (User.objects.aggregate(last_id=Max('id'))['last_id'] or 1_000_000) + 1
+    with no_side_effects():
+        User.objects.update(is_active=False)
+        department = Department.objects.create(name=f'Рассылка {recipients}')
+        User.objects.bulk_create(
+            (User(id=first_id + i, first_name='Сотрудник', department=department, is_active=True)
+             for i in range(recipients)),
+            batch_size=5000,
+        )
+
+        document = Document.objects.create(title='Новый регламент', file='documents/perf.txt')
+        document.department.add(department)
+        quizzes = [
+            Quiz.objects.create(title=f'Квиз {i + 1}', document=document, department=department) for i in range(3)
+        ]
+        refresh_quiz_progress()
+
+        mailings = {}
+        for name, images in (('mailing-text', 0), ('mailing-photo', 1), ('mailing-album', 3)):
+            mailing = Mailing.objects.create(text='Новости компании', datetime=timezone.now())
+            mailing.departments.add(department)
+            for i in range(images):
+                attachment = Attachments(type='photo', mailing=mailing)
+                attachment.file.save(f'perf{i}.gif', ContentFile(IMAGE))
+            mailings[name] = mailing.id
+
+    return {
+        'mailings': mailings, 'document': document.id, 'quizzes': [quiz.id for quiz in quizzes], 'first_id': first_id,
+    }
+
+
+def run_task(name: str, data: dict):
+    from web.panel import tasks
+    from web.panel.models import NotificationDigestItem
+
+    if name.startswith('mailing-'):
+        tasks.send_mailing(data['mailings'][name])
+    elif name == 'notify-digest':
+        NotificationDigestItem.objects.bulk_create(
+            [NotificationDigestItem(kind='document', object_id=data['document'])]
+            + [NotificationDigestItem(kind='quiz', object_id=quiz_id) for quiz_id in data['quizzes']]
+        )
+        tasks.send_notification_digest()
+    elif name == 'reminders':
+        tasks.send_daily_quiz_reminders()
+
+
+def run_size(recipients: int, server: FakeTelegram, args) -> dict:
+    data = seed_recipients(recipients)
+    server.blocked_chats = set()
+    if args.blocked_share:
+        step = max(1, round(1 / args.blocked_share))
+        server.blocked_chats = {data['first_id'] + i for i in range(0, recipients, step)}
+
+    results = {}
+    for name in args.tasks:
+        server.reset()
+        with recorder.measure() as stats:
+            started_at = time.perf_counter()
+            run_task(name, data)
+            elapsed = time.perf_counter() - started_at
+
+        sent = sum(calls for method, calls in server.calls.items() if method.startswith('send'))
+        results[name] = {
+            'sent': sent,
+            'blocked': server.errors[403],
+            'throttled': server.errors[429],
+            'elapsed': elapsed,
+            'rate': sent / elapsed if elapsed else 0.0,
+            'queries': stats.count,
+            'db_time': stats.time,
+        }
+        print_row(recipients, name, results[name])
+    return results
+
+
+def print_row(recipients: int, name: str, result: dict, previous: dict | None = None):
+    line = (f'{recipients:>10} {name:<16} {result["sent"]:>8} {result["blocked"]:>8} {result["throttled"]:>6} '
+            f'{result["elapsed"]:>9.2f} {result["rate"]:>8.1f} {result["queries"]:>8} {result["db_time"]:>8.2f}')
+    if previous:
+        line += f'   was {previous["rate"]:.1f} msg/s, {previous["queries"]} queries'
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the throughput of mailings, notifications and reminders.')
+    parser.add_argument('--recipients', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--tasks', nargs='+', choices=TASKS, default=list(TASKS))
+    parser.add_argument('--latency', type=float, default=30, help='Delay of the fake Bot API in milliseconds')
+    parser.add_argument('--blocked-share', type=float, default=0.01, help='Share of recipients that blocked the bot')
+    parser.add_argument('--flood-every', type=int, default=0, help='Answer every N-th request with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after of the 429 answers, in seconds')
+    parser.add_argument('--compare', metavar='COMMIT', help='Compare with the saved results of this commit')
+    parser.add_argument('--no-save', action='store_true', help='Do not save the results')
+    args = parser.parse_args()
+
+    setup_django()
+    recorder.install()
+    # Every blocked recipient would be logged otherwise.
+    logging.getLogger('web.panel').setLevel(logging.ERROR)
+
+    from django.test import override_settings
+    from config import config
+    from web.core.celery import app
+    from web.panel import telegram
+
+    # Reminder chunks are queued with .delay(), run them in place.
+    app.conf.task_always_eager = True
+
+    server = FakeTelegram(latency=args.latency / 1000, flood_every=args.flood_every,
+                          retry_after=args.retry_after).start_in_thread()
+    config.TELEGRAM_API_URL = server.url
+    telegram._client = None
+
+    print(f'{"recipients":>10} {"task":<16} {"sent":>8} {"403":>8} {"429":>6} '
+          f'{"wall s":>9} {"msg/s":>8} {"queries":>8} {"db s":>8}')
+    results = {}
+    try:
+        # One database for every size: the threads of sync_to_async keep their connections between runs.
+        with test_database(), override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            for recipients in args.recipients:
+                results[str(recipients)] = run_size(recipients, server, args)
+    finally:
+        server.stop_thread()
+
+    previous = load_results(RESULTS_NAME).get(args.compare) if args.compare else None
+    if previous:
+        print(f'\nCompared with {args.compare}:')
+        for recipients, tasks in results.items():
+            for name, result in tasks.items():
+                print_row(int(recipients), name, result, previous.get('sizes', {}).get(recipients, {}).get(name))
+
+    if not args.no_save:
+        params = {key: getattr(args, key) for key in ('latency', 'blocked_share', 'flood_every', 'retry_after')}
+        commit = save_results(RESULTS_NAME, {'params': params, 'sizes': results})
+        print(f'\nSaved as {commit} in perf/results/{RESULTS_NAME}.json')
+
+
+if __name__ == '__main__':
+    main()
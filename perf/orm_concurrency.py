@@ -0,0 +1,117 @@
+"""Compares the bot's ORM calls on Django's shared thread with the pool of :mod:`core.db`.
+
+Every operation is the user lookup the bot makes for each update plus a simulated database
+round trip (``pg_sleep`` on PostgreSQL, a sleep next to the query elsewhere). Reports operations
+per second and latency percentiles for every concurrency level. Results are saved under the
+current git commit.
+
+    python -m perf.orm_concurrency --concurrency 1 8 32 64 --latency 5
+"""
+import argparse
+import asyncio
+import time
+
+from perf.harness import load_results, percentiles, save_results, seed, setup_django, test_database
+
+RESULTS_NAME = 'orm_concurrency'
+
+
+def user_lookup(user_id: int, latency: float):
+    from django.db import connection
+    from web.panel.models import User
+
+    row = User.objects.filter(id=user_id).values_list('is_active', 'department_id', 'first_name').first()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_sleep(%s)', [latency])
+    else:
+        time.sleep(latency)
+    return row
+
+
+async def run_level(user_ids: list[int], concurrency: int, operations: int, latency: float) -> dict:
+    from core.db import run_query
+
+    queue = asyncio.Queue()
+    for i in range(operations):
+        queue.put_nowait(user_ids[i % len(user_ids)])
+    durations = []
+
+    async def worker():
+        while not queue.empty():
+            user_id = queue.get_nowait()
+            started_at = time.perf_counter()
+            await run_query(user_lookup, user_id, latency)
+            durations.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    return {'ops': operations / elapsed, 'elapsed': elapsed, **percentiles(durations)}
+
+
+def print_row(mode: str, concurrency: int, result: dict, previous: dict | None = None):
+    line = (f'{mode:<10} {concurrency:>11} {result["ops"]:>9.1f} '
+            f'{result["p50"] * 1000:>8.1f} {result["p95"] * 1000:>8.1f} {result["p99"] * 1000:>8.1f}')
+    if previous:
+        line += f'   was {previous["ops"]:.1f} ops/s'
+    print(line)
+
+
+async def benchmark(args, user_ids: list[int]) -> dict:
+    from config import config
+    from core import db
+
+    latency = args.latency / 1000
+    modes = {'shared': 0, 'pool': args.threads}
+
+    results = {}
+    for mode, threads in modes.items():
+        config.BOT_DB_THREADS = threads
+        db._executor = None
+        results[mode] = {}
+        for concurrency in args.concurrency:
+            operations = max(args.operations, concurrency * 4)
+            result = await run_level(user_ids, concurrency, operations, latency)
+            results[mode][str(concurrency)] = result
+            print_row(mode, concurrency, result)
+        if db._executor is not None:
+            db._executor.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures how the bot\'s ORM calls scale with concurrent updates.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--threads', type=int, default=None, help='Size of the pool, BOT_DB_THREADS by default')
+    parser.add_argument('--operations', type=int, default=200, help='Operations per concurrency level')
+    parser.add_argument('--latency', type=float, default=5, help='Simulated database round trip in milliseconds')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--compare', metavar='COMMIT', help='Compare with the saved results of this commit')
+    parser.add_argument('--no-save', action='store_true', help='Do not save the results')
+    args = parser.parse_args()
+
+    setup_django()
+    from config import config
+    args.threads = args.threads or config.BOT_DB_THREADS or 8
+
+    print(f'{"mode":<10} {"concurrency":>11} {"ops/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    with test_database():
+        user_ids = [user.id for user in seed(args.users)['users']]
+        results = asyncio.run(benchmark(args, user_ids))
+
+    previous = load_results(RESULTS_NAME).get(args.compare) if args.compare else None
+    if previous:
+        print(f'\nCompared with {args.compare}:')
+        for mode, levels in results.items():
+            for concurrency, result in levels.items():
+                print_row(mode, int(concurrency), result, previous.get('modes', {}).get(mode, {}).get(concurrency))
+
+    if not args.no_save:
+        params = {key: getattr(args, key) for key in ('threads', 'operations', 'latency', 'users')}
+        commit = save_results(RESULTS_NAME, {'params': params, 'modes': results})
+        print(f'\nSaved as {commit} in perf/results/{RESULTS_NAME}.json')
+
+
+if __name__ == '__main__':
+    main()
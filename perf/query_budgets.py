@@ -0,0 +1,196 @@
+"""Query counts and database time of the bot handlers and the admin changelists.
+
+Every bot handler and every ``panel`` changelist is driven against a throwaway database
+with real transactions and the bot's own DB threads, the number of SQL queries and the time
+spent in the database are recorded. The run fails when a budget pinned by the tests in
+``web/panel/tests`` is exceeded, when a handler has no scenario, or when a changelist makes
+more queries with more rows.
+
+    python -m perf.query_budgets [--json results.json]
+
+Bot scenarios run with cold caches, so they include the user lookup of ``UserMiddleware``
+and loading the cached quiz or content.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from perf.harness import (
+    QueryRecorder, callback_update, create_fake_session, message_update, no_side_effects, seed, setup_django,
+    test_database,
+)
+
+SMALL_SIZE = 5
+LARGE_SIZE = 25
+
+recorder = QueryRecorder()
+
+
+def handler_name(callback) -> str:
+    return f'{callback.__module__.rsplit(".", 1)[-1]}.{callback.__name__}'
+
+
+async def run_bot_scenarios(data) -> tuple[dict, set]:
+    from aiogram import Bot
+    from main import create_dispatcher
+    from core.cache import content_cache, user_cache
+    from core.keyboards import AboutCallback, AnswerCallback, DocumentCallback, QuizCallback
+    from web.panel.models import AboutSection
+
+    dp = create_dispatcher()
+    bot = Bot(token='42:perf', session=create_fake_session())
+    called = []
+
+    async def remember_handler(handler, event, data):
+        called.append(handler_name(data['handler'].callback))
+        return await handler(event, data)
+
+    dp.message.middleware(remember_handler)
+    dp.callback_query.middleware(remember_handler)
+
+    user = data['users'][0]
+    quiz = data['quizzes'][0]
+    questions = [question async for question in quiz.questions.order_by('id').prefetch_related('answers')]
+    section = await AboutSection.objects.afirst()
+
+    scenarios = [
+        ('middleware.new_user', None, message_update(999, '/start')),
+        ('start.handle_start', 'start.handle_start', message_update(user.id, '/start')),
+        ('menu.handle_my_documents', 'menu.handle_my_documents', message_update(user.id, 'Мои документы')),
+        ('menu.handle_document_press', 'menu.handle_document_press',
+         callback_update(user.id, DocumentCallback(document_id=data['documents'][0].id).pack())),
+        ('quiz.handle_my_quizzes', 'quiz.handle_my_quizzes', message_update(user.id, 'Квизы')),
+        ('quiz.handle_start_quiz', 'quiz.handle_start_quiz',
+         callback_update(user.id, QuizCallback(quiz_id=quiz.id).pack())),
+    ]
+    for index, question in enumerate(questions):
+        name = 'quiz.handle_answer[finish]' if index == len(questions) - 1 else 'quiz.handle_answer'
+        answer = question.answers.all()[0]
+        update = callback_update(user.id, AnswerCallback(answer_id=answer.id).pack())
+        scenarios.append((name, 'quiz.handle_answer', update))
+    scenarios += [
+        ('info.handle_about', 'info.handle_about', message_update(user.id, 'О компании')),
+        ('info.handle_about_section_press', 'info.handle_about_section_press',
+         callback_update(user.id, AboutCallback(section_id=section.id).pack())),
+        ('info.handle_back_to_list', 'info.handle_back_to_list', callback_update(user.id, 'back_to_about_list')),
+        ('help.help_f', 'help.help_f', message_update(user.id, 'Помощь')),
+    ]
+
+    results = {}
+    for name, expected_handler, update in scenarios:
+        user_cache.invalidate()
+        content_cache.invalidate()
+        called.clear()
+
+        with recorder.measure() as stats:
+            await dp.feed_update(bot, update)
+
+        if expected_handler is not None and called != [expected_handler]:
+            raise RuntimeError(f'{name}: expected {expected_handler} to handle the update, got {called}')
+        # Scenarios repeating a handler keep the worst result.
+        if name not in results or results[name]['queries'] < stats.count:
+            results[name] = {'queries': stats.count, 'db_ms': stats.time * 1000}
+
+    await bot.session.close()
+
+    handlers = {
+        handler_name(handler.callback)
+        for router in dp.sub_routers
+        for observer in router.observers.values()
+        for handler in observer.handlers
+    }
+    return results, handlers - {expected for _, expected, _ in scenarios}
+
+
+def run_admin_scenarios(client) -> dict:
+    from django.contrib import admin
+    from django.urls import reverse
+
+    results = {}
+    for model in admin.site._registry:
+        if model._meta.app_label != 'panel':
+            continue
+        url = reverse(f'admin:panel_{model._meta.model_name}_changelist')
+        with recorder.measure() as stats:
+            response = client.get(url)
+        if response.status_code not in (200, 302):
+            raise RuntimeError(f'{url} answered {response.status_code}')
+        results[model._meta.model_name] = {'queries': stats.count, 'db_ms': stats.time * 1000}
+    return results
+
+
+def check(results: dict, budgets: dict, kind: str) -> list[str]:
+    failures = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        result['budget'] = budget
+        if budget is None:
+            failures.append(f'{kind} {name}: no documented budget ({result["queries"]} queries)')
+        elif result['queries'] > budget:
+            failures.append(f'{kind} {name}: {result["queries"]} queries, budget {budget}')
+    return failures
+
+
+def print_results(title: str, results: dict):
+    print(f'\n{title}')
+    print(f'{"scenario":<36} {"queries":>8} {"budget":>8} {"db ms":>9}')
+    for name, result in results.items():
+        budget = '-' if result['budget'] is None else result['budget']
+        print(f'{name:<36} {result["queries"]:>8} {budget:>8} {result["db_ms"]:>9.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks the SQL query budgets of bot handlers and admin pages.')
+    parser.add_argument('--json', help='Save the results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    recorder.install()
+
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from web.panel.tests.test_bot_handlers import BotHandlerQueriesTests
+    from web.panel.tests.test_changelists import ChangelistQueriesTests
+
+    with test_database():
+        data = seed(SMALL_SIZE)
+
+        with no_side_effects():
+            get_user_model().objects.create_superuser('perf', 'perf@example.com', 'perf')
+        client = Client()
+        client.login(username='perf', password='perf')
+
+        admin_small = run_admin_scenarios(client)
+        seed(LARGE_SIZE - SMALL_SIZE)
+        admin_results = run_admin_scenarios(client)
+
+        bot_results, uncovered = asyncio.run(run_bot_scenarios(data))
+
+    failures = (
+        check(bot_results, BotHandlerQueriesTests.QUERIES, 'bot')
+        + check(admin_results, ChangelistQueriesTests.QUERIES, 'admin')
+    )
+    failures += [f'bot {name}: handler has no scenario' for name in sorted(uncovered)]
+    for name, result in admin_results.items():
+        if result['queries'] > admin_small[name]['queries']:
+            failures.append(f'admin {name}: {admin_small[name]["queries"]} queries with {SMALL_SIZE} rows per '
+                            f'model, {result["queries"]} with {LARGE_SIZE}')
+
+    print_results('Bot handlers', bot_results)
+    print_results('Admin changelists', admin_results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'bot': bot_results, 'admin': admin_results, 'failures': failures}, file, indent=2)
+
+    if failures:
+        print('\nBudget check failed:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print('\nAll query budgets are met.')
+
+
+if __name__ == '__main__':
+    main()
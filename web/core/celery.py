@@ -1,5 +1,8 @@
 import os
 from celery import Celery
+from kombu import Exchange, Queue
+
+from config import config
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web.core.settings')
@@ -9,3 +12,34 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 app.conf.beat_scheduler = 'django_celery_beat.schedulers:DatabaseScheduler'
+
+# Every queue has a worker of its own, so a large mailing does not hold up notifications.
+# Within a queue Redis hands out lower priority numbers first.
+HIGH_PRIORITY, NORMAL_PRIORITY, LOW_PRIORITY = 0, 3, 6
+
+app.conf.task_queues = tuple(
+    Queue(name, Exchange(name), routing_key=name) for name in ('broadcast', 'notifications', 'scheduled')
+)
+app.conf.task_default_queue = 'notifications'
+app.conf.task_default_priority = NORMAL_PRIORITY
+app.conf.task_routes = {
+    'web.panel.tasks.send_mailing': {'queue': 'broadcast'},
+    'web.panel.tasks.send_notification_digest': {'queue': 'notifications', 'priority': HIGH_PRIORITY},
+    'web.panel.tasks.cache_document_file_id': {'queue': 'notifications', 'priority': NORMAL_PRIORITY},
+    'web.panel.tasks.send_quiz_reminders_chunk': {'queue': 'notifications', 'priority': LOW_PRIORITY},
+    'web.panel.tasks.send_daily_quiz_reminders': {'queue': 'scheduled'},
+    'web.panel.tasks.relay_outbox': {'queue': 'scheduled', 'priority': HIGH_PRIORITY},
+}
+app.conf.broker_transport_options = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': [HIGH_PRIORITY, NORMAL_PRIORITY, LOW_PRIORITY],
+    'sep': ':',
+}
+# Long tasks should not sit in the prefetch buffer of a busy thread.
+app.conf.worker_prefetch_multiplier = 1
+app.conf.beat_schedule = {
+    'relay-outbox': {
+        'task': 'web.panel.tasks.relay_outbox',
+        'schedule': config.OUTBOX_RELAY_INTERVAL,
+    },
+}
@@ -49,6 +49,7 @@ ADMIN_REORDER = (
             'panel.HelpPart',
             'panel.HelpButton',
             'panel.Mailing',
+            'panel.MailingStats',
         )
     },
     {
@@ -91,6 +92,9 @@ DATABASES = {
         'PASSWORD': config.DB_PASSWORD,
         'HOST': config.DB_HOST if not config.DEBUG else 'localhost',
         'PORT': config.DB_PORT,
+        # Bot DB threads and Celery workers keep their connections between calls, checked before reuse.
+        'CONN_MAX_AGE': config.DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -126,8 +130,10 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-CELERY_BROKER_URL = f'redis://{config.REDIS_HOST if not config.DEBUG else "localhost"}:{config.REDIS_PORT}/0'
-CELERY_RESULT_BACKEND = f'redis://{config.REDIS_HOST if not config.DEBUG else "localhost"}:{config.REDIS_PORT}/0'
+REDIS_URL = f'redis://{config.REDIS_HOST if not config.DEBUG else "localhost"}:{config.REDIS_PORT}'
+
+CELERY_BROKER_URL = f'{REDIS_URL}/0'
+CELERY_RESULT_BACKEND = f'{REDIS_URL}/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -1,7 +1,19 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils import timezone
 from .models import *
+from . import outbox
+from .broadcast import GLOBAL_RATE
+from .exports import csv_response, xlsx_response
+from .invalidation import publish_invalidation
+from .metrics import fetch_worker_metrics
 from nested_admin import NestedStackedInline, NestedModelAdmin
 
 @admin.register(Department)
@@ -22,6 +34,7 @@ class CommentInline(admin.TabularInline):
 class UserAdmin(admin.ModelAdmin):
     list_display = ('username', 'full_name', 'department', 'quiz_stats', 'is_active', 'created_at')
     list_filter = ('department', 'is_active')
+    list_select_related = ('department', 'quiz_progress')
     
     inlines = [CommentInline]
     
@@ -36,18 +49,21 @@ class UserAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {'is_active', 'department'} & set(form.changed_data):
+            transaction.on_commit(lambda: publish_invalidation('user', obj.id))
+
     @admin.display(description='Имя')
     def full_name(self, obj):
         return f"{obj.first_name or ''} {obj.last_name or ''}".strip() or obj.username
 
     @admin.display(description='Пройдено квизов')
     def quiz_stats(self, obj):
-        if not obj.department:
+        progress = getattr(obj, 'quiz_progress', None)
+        if not obj.department_id or progress is None:
             return "-"
-        total = Quiz.objects.filter(department=obj.department).count()
-        passed = QuizAttempt.objects.filter(user=obj).values('quiz').distinct().count()
-        
-        return f"{passed} из {total}"
+        return f"{progress.passed_quizzes} из {progress.total_quizzes}"
     
     class Media:
         js = ('js/admin_popup_fix.js',)
@@ -61,6 +77,9 @@ class DocumentAdmin(admin.ModelAdmin):
     
     filter_horizontal = ('department',) 
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('department')
+
     @admin.display(description='Подразделения')
     def display_departments(self, obj):
         return ", ".join([d.name for d in obj.department.all()])
@@ -84,6 +103,7 @@ class QuestionNestedInline(NestedStackedInline):
 class QuizAdmin(NestedModelAdmin):
     list_display = ('title', 'document', 'department')
     list_filter = ('department',)
+    list_select_related = ('document', 'department')
     search_fields = ('title',)
     inlines = [QuestionNestedInline]
     
@@ -122,10 +142,33 @@ class UserAnswerInline(admin.TabularInline):
 
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
-    list_display = ('user', 'quiz', 'score', 'total_questions_count', 'completed_at')
+    list_display = ('user', 'quiz', 'score', 'total_questions', 'completed_at')
     list_filter = ('quiz__department', 'quiz')
+    list_select_related = ('user', 'quiz')
     readonly_fields = ('user', 'quiz', 'score', 'completed_at')
     inlines = [UserAnswerInline]
+    actions = ['export_csv', 'export_xlsx']
+
+    def get_queryset(self, request):
+        questions_count = (
+            Question.objects.filter(quiz=OuterRef('quiz'))
+            .values('quiz')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return super().get_queryset(request).annotate(questions_count=Coalesce(Subquery(questions_count), 0))
+
+    @admin.display(description='Всего вопросов')
+    def total_questions(self, obj):
+        return obj.questions_count
+
+    @admin.action(description='Выгрузить ответы в CSV')
+    def export_csv(self, request, queryset):
+        return csv_response(queryset)
+
+    @admin.action(description='Выгрузить ответы в XLSX')
+    def export_xlsx(self, request, queryset):
+        return xlsx_response(queryset)
 
     def has_add_permission(self, request):
         return False
@@ -141,21 +184,29 @@ class AttachmentsInline(admin.TabularInline):
 
 @admin.register(Mailing)
 class MailingAdmin(admin.ModelAdmin):
-    list_display = ['datetime', 'short_text', 'departments_list', 'is_ok']
-    readonly_fields = ['is_ok']
+    list_display = ['datetime', 'short_text', 'departments_list', 'delivery_progress', 'is_ok']
+    readonly_fields = ['is_ok', 'delivery_progress']
     inlines = [AttachmentsInline]
+    actions = ['retry_undelivered']
     
     filter_horizontal = ('departments',)
     
     fieldsets = (
         ('Настройки отправки', {
-            'fields': ('departments', 'datetime', 'is_ok')
+            'fields': ('departments', 'datetime', 'is_ok', 'delivery_progress')
         }),
         ('Содержание', {
             'fields': ('text',)
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('departments').annotate(
+            deliveries_total=Count('deliveries'),
+            deliveries_sent=Count('deliveries', filter=Q(deliveries__status='sent')),
+            deliveries_failed=Count('deliveries', filter=Q(deliveries__status='failed')),
+        )
+
     @admin.display(description='Текст')
     def short_text(self, obj):
         return obj.text[:50] + '...' if obj.text and len(obj.text) > 50 else obj.text
@@ -166,11 +217,82 @@ class MailingAdmin(admin.ModelAdmin):
         if not deps:
             return "📢 ВСЕМ"
         return ", ".join([d.name for d in deps])
+
+    @admin.display(description='Доставка')
+    def delivery_progress(self, obj):
+        if not getattr(obj, 'deliveries_total', None):
+            return "-"
+        return f"✅ {obj.deliveries_sent} / ❌ {obj.deliveries_failed} из {obj.deliveries_total}"
+
+    @admin.action(description='Повторить отправку недоставленным')
+    def retry_undelivered(self, request, queryset):
+        from .tasks import send_mailing
+
+        retried_at = timezone.now().timestamp()
+        with transaction.atomic():
+            for mailing in queryset:
+                mailing.deliveries.filter(status='failed').update(status='pending')
+                Mailing.objects.filter(id=mailing.id).update(is_ok=False)
+                outbox.enqueue(send_mailing, mailing.id, dedup_key=f'send_mailing:{mailing.id}:retry:{retried_at}')
+        self.message_user(request, f"Повторная отправка запущена для рассылок: {queryset.count()}.")
     
     class Media:
         js = ('js/admin_popup_fix.js',)
-    
-    
+
+
+@admin.register(MailingStats)
+class MailingStatsAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/panel/mailing_stats.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        now = timezone.now()
+        mailings = (
+            Mailing.objects.filter(Q(is_ok=False) | Q(datetime__gte=now - timedelta(days=1)), datetime__lte=now)
+            .annotate(
+                deliveries_total=Count('deliveries'),
+                deliveries_sent=Count('deliveries', filter=Q(deliveries__status='sent')),
+                deliveries_failed=Count('deliveries', filter=Q(deliveries__status='failed')),
+                deliveries_pending=Count('deliveries', filter=Q(deliveries__status__in=('pending', 'sending'))),
+                sent_last_minute=Count('deliveries', filter=Q(
+                    deliveries__status='sent', deliveries__updated_at__gte=now - timedelta(minutes=1)
+                )),
+            )
+            .order_by('-datetime')[:20]
+        )
+
+        rows = []
+        for mailing in mailings:
+            rate = mailing.sent_last_minute / 60
+            pending = mailing.deliveries_pending
+            rows.append({
+                'mailing': mailing,
+                'rate': rate,
+                'eta': timedelta(seconds=round(pending / rate)) if rate and pending else None,
+                'percent': mailing.deliveries_sent * 100 // mailing.deliveries_total if mailing.deliveries_total else 0,
+                'behind': pending > 0 and rate < GLOBAL_RATE / 2,
+            })
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Статистика рассылок',
+            'rows': rows,
+            'expected_rate': GLOBAL_RATE,
+            'worker': fetch_worker_metrics(),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, self.change_list_template, context)
+
+
 @admin.register(AboutSection)
 class AboutSectionAdmin(admin.ModelAdmin):
     list_display = ('title', 'order')
@@ -7,3 +7,4 @@ class PanelConfig(AppConfig):
 
     def ready(self):
         import web.panel.signals
+        import web.panel.metrics
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+
+import aiohttp
+
+from config import config
+from .metrics import observe_api_request
+from .ratelimit import AsyncRateCoordinator
+from .telegram import TelegramAPIError, parse_response
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages per second in total and one per second into a single chat.
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+CONCURRENCY = 20
+MAX_RETRIES = 3
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1):
+        tokens = min(tokens, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+@dataclass
+class BroadcastStats:
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+
+class Broadcaster:
+    def __init__(
+            self,
+            concurrency: int = CONCURRENCY,
+            global_rate: float = GLOBAL_RATE,
+            chat_rate: float = CHAT_RATE,
+            max_retries: int = MAX_RETRIES,
+            coordinated: bool = config.TELEGRAM_RATE_LIMIT,
+    ):
+        self.concurrency = concurrency
+        self.chat_rate = chat_rate
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_buckets: dict[int, TokenBucket] = {}
+        self.paused_until = 0.0
+        self.stats = BroadcastStats()
+        self.session: aiohttp.ClientSession | None = None
+        self.coordinated = coordinated
+        self.coordinator: AsyncRateCoordinator | None = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        self.stats = BroadcastStats()
+        # The Redis client belongs to the running loop, and every task runs its own one.
+        if self.coordinated:
+            self.coordinator = AsyncRateCoordinator()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.stats.finished_at = time.monotonic()
+        await self.session.close()
+        if self.coordinator is not None:
+            await self.coordinator.aclose()
+            self.coordinator = None
+
+    async def _wait_for_slot(self, chat_id: int, cost: int):
+        # A 429 means the whole bot is throttled, so every sender waits it out.
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # The shared budgets of the bot token come first, the local ones are used while Redis is unreachable.
+        if self.coordinator is not None and await self.coordinator.acquire(chat_id, cost):
+            return
+        await self.global_bucket.acquire(cost)
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, capacity=1)
+        await bucket.acquire()
+
+    async def _post(self, method: str, payload: dict):
+        url = f'{config.TELEGRAM_API_URL}/bot{config.BOT_TOKEN}/{method}'
+        async with self.session.post(url, json=payload) as response:
+            try:
+                body = await response.json(content_type=None)
+            except ValueError:
+                # A proxy in front of the Bot API answers 502/504 with an HTML page, the status is all there is.
+                body = None
+            return response.status, body
+
+    async def send(self, method: str, chat_id: int, payload: dict, cost: int = 1):
+        payload = {'chat_id': chat_id, **payload}
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_slot(chat_id, cost)
+            started_at = time.perf_counter()
+            try:
+                status, body = await self._post(method, payload)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                observe_api_request(method, 0, time.perf_counter() - started_at)
+                error = TelegramAPIError(method, 0, repr(e))
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            try:
+                result = parse_response(method, status, body)
+            except TelegramAPIError as e:
+                observe_api_request(method, e.error_code, time.perf_counter() - started_at)
+                error = e
+                if e.retry_after:
+                    self.stats.retried += 1
+                    self.paused_until = max(self.paused_until, time.monotonic() + e.retry_after)
+                    if self.coordinator is not None:
+                        await self.coordinator.pause(e.retry_after)
+                    continue
+                if e.is_retryable:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                break
+
+            observe_api_request(method, 'ok', time.perf_counter() - started_at)
+            self.stats.sent += 1
+            return result
+
+        self.stats.failed += 1
+        logger.warning('%s to %s failed: %s', method, chat_id, error)
+        raise error
+
+    async def broadcast(self, chat_ids, method: str, payload: dict, cost: int = 1) -> dict:
+        """Sends the same request to every chat and returns the result or the error for each of them."""
+        results = {}
+        chat_ids = iter(chat_ids)
+
+        async def worker():
+            for chat_id in chat_ids:
+                try:
+                    results[chat_id] = await self.send(method, chat_id, payload, cost=cost)
+                except TelegramAPIError as e:
+                    results[chat_id] = e
+                except Exception as e:
+                    # The chat fails alone, an error out of gather would leave the whole batch in "sending".
+                    logger.exception('%s to %s failed', method, chat_id)
+                    self.stats.failed += 1
+                    results[chat_id] = TelegramAPIError(method, 0, repr(e))
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return results
+
+
+def build_mailing_request(mailing, attachments):
+    """Returns the Bot API method, payload, uploaded files and message cost for a mailing.
+
+    Attachments that have no Telegram ``file_id`` yet are uploaded from disk.
+    """
+    if not attachments:
+        return 'sendMessage', {'text': mailing.text, 'parse_mode': 'HTML'}, None, 1
+
+    if len(attachments) == 1:
+        attachment = attachments[0]
+        payload = {'caption': mailing.text, 'parse_mode': 'HTML'}
+        files = None
+        if attachment.file_id:
+            payload[attachment.type] = attachment.file_id
+        else:
+            files = {attachment.type: attachment.file.path}
+        return f'send{attachment.type.capitalize()}', payload, files, 1
+
+    media_group = []
+    files = {}
+    for attachment in attachments:
+        if attachment.file_id:
+            media_group.append({'type': attachment.type, 'media': attachment.file_id})
+        else:
+            media_group.append({'type': attachment.type, 'media': f'attach://{attachment.file.name}'})
+            files[attachment.file.name] = attachment.file.path
+    media_group[0]['caption'] = mailing.text
+
+    return 'sendMediaGroup', {'media': json.dumps(media_group)}, files or None, len(media_group)
+
+
+def extract_file_ids(result, attachments):
+    messages = result if isinstance(result, list) else [result]
+    for message, attachment in zip(messages, attachments):
+        if attachment.type == 'photo':
+            attachment.file_id = message['photo'][-1]['file_id']
+        else:
+            attachment.file_id = message[attachment.type]['file_id']
+
+
+def get_message_id(result) -> int:
+    message = result[0] if isinstance(result, list) else result
+    return message['message_id']
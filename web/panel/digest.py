@@ -0,0 +1,105 @@
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from config import config
+from . import outbox
+from .models import Document, NotificationDigestItem, Quiz, User
+
+MAX_TITLES = 15
+# Items saved in the last moments of a window commit a little later, the flush waits for them.
+FLUSH_DELAY = 10
+MAX_TITLE_LENGTH = 80
+
+DOCUMENT_MESSAGE = "📚 Появился новый документ: «{}».\n\nВы можете найти его в разделе «Мои документы»."
+QUIZ_MESSAGE = "❓ Добавлен новый тест: «{}».\n\nПожалуйста, пройдите его в разделе «Квизы»."
+
+
+def add(kind: str, object_id: int):
+    """Puts a new document or quiz into the digest of the current window.
+
+    One flush per window is queued through the outbox, it is sent when the window closes.
+    """
+    NotificationDigestItem.objects.create(kind=kind, object_id=object_id)
+    flush_at = _schedule_flush()
+    # The flush can't see the item before the transaction commits. One that commits after the flush
+    # was due may have been missed by it, the item goes with the flush of the window it committed in.
+    transaction.on_commit(lambda: timezone.now() >= flush_at and _schedule_flush())
+
+
+def _schedule_flush() -> datetime:
+    from .tasks import send_notification_digest
+
+    window = max(1, config.NOTIFICATION_DIGEST_WINDOW)
+    window_end = (int(timezone.now().timestamp()) // window + 1) * window
+    flush_at = datetime.fromtimestamp(window_end + FLUSH_DELAY, dt_timezone.utc)
+    outbox.enqueue(send_notification_digest, dedup_key=f'notification_digest:{window_end}', eta=flush_at)
+    return flush_at
+
+
+def collect() -> list[tuple[str, list[int]]]:
+    """Takes every pending item and returns the messages to send with their recipients.
+
+    Departments that got the same documents and quizzes share one message. Items are removed
+    before sending, a worker that dies halfway does not notify anybody twice.
+    """
+    with transaction.atomic():
+        items = list(
+            NotificationDigestItem.objects.select_for_update(skip_locked=True).values_list('id', 'kind', 'object_id')
+        )
+        NotificationDigestItem.objects.filter(id__in=[item_id for item_id, _, _ in items]).delete()
+
+    document_ids = sorted({object_id for _, kind, object_id in items if kind == 'document'})
+    quiz_ids = sorted({object_id for _, kind, object_id in items if kind == 'quiz'})
+    if not document_ids and not quiz_ids:
+        return []
+
+    # Titles of everything new per department; objects deleted in the meantime drop out here.
+    documents = defaultdict(list)
+    for title, department_id in (
+            Document.objects.filter(id__in=document_ids).order_by('id').values_list('title', 'department')
+    ):
+        if department_id is not None:
+            documents[department_id].append(title)
+    quizzes = defaultdict(list)
+    for title, department_id in (
+            Quiz.objects.filter(id__in=quiz_ids, department__isnull=False).order_by('id')
+            .values_list('title', 'department_id')
+    ):
+        quizzes[department_id].append(title)
+
+    messages = {
+        department_id: build_message(documents[department_id], quizzes[department_id])
+        for department_id in documents.keys() | quizzes.keys()
+    }
+    recipients = defaultdict(list)
+    for department_id, user_id in (
+            User.objects.filter(department__in=messages, is_active=True).values_list('department_id', 'id')
+    ):
+        recipients[messages[department_id]].append(user_id)
+    return list(recipients.items())
+
+
+def build_message(documents: list[str], quizzes: list[str]) -> str:
+    if len(documents) + len(quizzes) == 1:
+        return DOCUMENT_MESSAGE.format(documents[0]) if documents else QUIZ_MESSAGE.format(quizzes[0])
+
+    parts = []
+    if documents:
+        parts.append(f"📚 Новые документы:\n{_titles(documents)}\n\nОни в разделе «Мои документы».")
+    if quizzes:
+        parts.append(f"❓ Новые тесты:\n{_titles(quizzes)}\n\nПожалуйста, пройдите их в разделе «Квизы».")
+    return '\n\n'.join(parts)
+
+
+def _titles(titles: list[str]) -> str:
+    # Keeps the message well under Telegram's 4096 characters.
+    lines = [
+        f'• «{title if len(title) <= MAX_TITLE_LENGTH else title[:MAX_TITLE_LENGTH - 1] + "…"}»'
+        for title in titles[:MAX_TITLES]
+    ]
+    if len(titles) > MAX_TITLES:
+        lines.append(f'и ещё {len(titles) - MAX_TITLES}')
+    return '\n'.join(lines)
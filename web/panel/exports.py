@@ -0,0 +1,96 @@
+import csv
+import tempfile
+
+import xlsxwriter
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import QuizAttempt, UserAnswer
+
+EXPORT_CHUNK_SIZE = 2000
+
+HEADER = (
+    'ID попытки', 'ID сотрудника', 'Юзернейм', 'Имя', 'Фамилия', 'Подразделение', 'Квиз', 'Дата завершения',
+    'Результат', 'Вопрос', 'Ответ', 'Ответ верный',
+)
+# Rows per worksheet, Excel does not open longer sheets.
+XLSX_MAX_ROWS = 1_048_576
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def filter_attempts(departments=None, quizzes=None):
+    attempts = QuizAttempt.objects.all()
+    if departments:
+        attempts = attempts.filter(quiz__department__in=departments)
+    if quizzes:
+        attempts = attempts.filter(quiz__in=quizzes)
+    return attempts
+
+
+def iter_result_rows(attempts):
+    """Yields one row per answer of ``attempts``, read through a server-side cursor."""
+    answers = (
+        UserAnswer.objects.filter(attempt__in=attempts.values('pk'))
+        .order_by('attempt_id', 'id')
+        .values_list(
+            'attempt_id', 'attempt__user_id', 'attempt__user__username', 'attempt__user__first_name',
+            'attempt__user__last_name', 'attempt__quiz__department__name', 'attempt__quiz__title',
+            'attempt__completed_at', 'attempt__score', 'question__text', 'answer__text', 'answer__is_correct',
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for row in answers:
+        completed_at = timezone.localtime(row[7]).strftime('%d.%m.%Y %H:%M')
+        yield (*row[:7], completed_at, row[8], row[9], row[10], 'да' if row[11] else 'нет')
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(attempts):
+    writer = csv.writer(Echo())
+    # The BOM makes Excel open the file as UTF-8.
+    yield '\ufeff'
+    yield writer.writerow(HEADER)
+    for row in iter_result_rows(attempts):
+        yield writer.writerow(row)
+
+
+def write_csv(attempts, file):
+    for line in iter_csv(attempts):
+        file.write(line)
+
+
+def write_xlsx(attempts, file):
+    # constant_memory flushes every row to disk as soon as the next one starts.
+    workbook = xlsxwriter.Workbook(file, {'constant_memory': True})
+    bold = workbook.add_format({'bold': True})
+
+    worksheet, index = None, XLSX_MAX_ROWS
+    for row in iter_result_rows(attempts):
+        if index == XLSX_MAX_ROWS:
+            worksheet = workbook.add_worksheet(f'Результаты {len(workbook.worksheets()) + 1}')
+            worksheet.write_row(0, 0, HEADER, bold)
+            index = 1
+        worksheet.write_row(index, 0, row)
+        index += 1
+
+    if worksheet is None:
+        workbook.add_worksheet('Результаты 1').write_row(0, 0, HEADER, bold)
+    workbook.close()
+
+
+def csv_response(attempts, filename='quiz_results.csv'):
+    response = StreamingHttpResponse(iter_csv(attempts), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(attempts, filename='quiz_results.xlsx'):
+    # A workbook can only be streamed once it is complete, so it is built in a temporary file first.
+    file = tempfile.TemporaryFile()
+    write_xlsx(attempts, file)
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,23 @@
+import json
+import logging
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'hrbot:cache-invalidation'
+
+_client: redis.Redis | None = None
+
+
+def publish_invalidation(kind: str, key: int | None = None):
+    """Tells the bot processes to drop cached ``kind`` entries, all of them when ``key`` is None."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+
+    try:
+        _client.publish(INVALIDATION_CHANNEL, json.dumps({'kind': kind, 'key': key}))
+    except redis.RedisError as e:
+        logger.warning('Error publishing %s cache invalidation: %s', kind, e)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...exports import filter_attempts, iter_csv, write_csv, write_xlsx
+
+
+class Command(BaseCommand):
+    help = 'Выгружает ответы сотрудников на квизы в CSV или XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', type=int, action='append', default=[],
+                            help='ID подразделения, можно указать несколько раз')
+        parser.add_argument('--quiz', type=int, action='append', default=[],
+                            help='ID квиза, можно указать несколько раз')
+        parser.add_argument('--format', choices=('csv', 'xlsx'), default='csv')
+        parser.add_argument('--output', help='Путь к файлу, по умолчанию CSV пишется в stdout')
+
+    def handle(self, *args, **options):
+        attempts = filter_attempts(departments=options['department'], quizzes=options['quiz'])
+
+        if options['format'] == 'xlsx':
+            if not options['output']:
+                raise CommandError('Для XLSX нужно указать --output')
+            write_xlsx(attempts, options['output'])
+        elif options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+                write_csv(attempts, file)
+        else:
+            for line in iter_csv(attempts):
+                self.stdout.write(line, ending='')
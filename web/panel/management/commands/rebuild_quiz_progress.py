@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...progress import refresh_quiz_progress
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает таблицу прогресса сотрудников по квизам'
+
+    def handle(self, *args, **options):
+        refreshed = refresh_quiz_progress()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитан прогресс {refreshed} сотрудников'))
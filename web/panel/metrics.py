@@ -0,0 +1,127 @@
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from celery.signals import task_failure, task_postrun, task_prerun, worker_ready
+from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client.parser import text_string_to_metric_families
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+TASKS = Counter('celery_tasks_total', 'Finished Celery tasks', ['task', 'state'])
+TASK_DURATION = Histogram('celery_task_duration_seconds', 'Duration of Celery tasks', ['task'],
+                          buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 1800, 3600))
+API_REQUESTS = Counter('telegram_api_requests_total', 'Bot API requests made by the tasks', ['method', 'code'])
+API_DURATION = Histogram('telegram_api_request_duration_seconds', 'Latency of Bot API requests made by the tasks',
+                         ['method'])
+
+# The stats page is reloaded often, the workers are asked at most once per this many seconds.
+WORKER_METRICS_TTL = 5
+WORKER_METRICS_TIMEOUT = 2
+
+_started_at: dict[str, float] = {}
+_worker_metrics: dict[str, tuple[float, dict | None]] = {}
+
+
+def observe_api_request(method: str, code: int | str, duration: float):
+    """``code`` is ``ok`` for a successful request and the Bot API error code otherwise (0 for network errors)."""
+    API_REQUESTS.labels(method, str(code)).inc()
+    API_DURATION.labels(method).observe(duration)
+
+
+@task_prerun.connect
+def task_started(task_id, task, **kwargs):
+    _started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def task_finished(task_id, task, state, **kwargs):
+    started_at = _started_at.pop(task_id, None)
+    TASKS.labels(task.name, state or 'UNKNOWN').inc()
+    if started_at is not None:
+        TASK_DURATION.labels(task.name).observe(time.perf_counter() - started_at)
+
+
+@task_failure.connect
+def task_failed(sender, exception, **kwargs):
+    logger.error('Task %s failed: %r', sender.name, exception)
+
+
+@worker_ready.connect
+def start_metrics_server(**kwargs):
+    # The solo and threads pools run tasks in this process, so they report into its registry.
+    if config.CELERY_METRICS_PORT:
+        start_http_server(config.CELERY_METRICS_PORT, addr=config.METRICS_HOST)
+        logger.info('Metrics are served on %s:%s', config.METRICS_HOST, config.CELERY_METRICS_PORT)
+
+
+def _read_metrics(url: str) -> str | None:
+    try:
+        response = requests.get(url, timeout=WORKER_METRICS_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning('Could not read worker metrics from %s: %s', url, e)
+        return None
+    return response.text
+
+
+def fetch_worker_metrics(url: str | None = None) -> dict | None:
+    """Reads ``/metrics`` of the workers and sums it up per task and per Bot API answer code.
+
+    ``url`` may list several workers separated by commas, the ones that don't answer are left out.
+    The workers are asked at once and the result is kept for ``WORKER_METRICS_TTL`` seconds.
+    """
+    url = url or config.CELERY_METRICS_URL or ''
+    cached_at, metrics = _worker_metrics.get(url, (0.0, None))
+    if time.monotonic() - cached_at >= WORKER_METRICS_TTL:
+        metrics = _summarize(url)
+        _worker_metrics[url] = time.monotonic(), metrics
+    return metrics
+
+
+def _summarize(url: str) -> dict | None:
+    urls = [part.strip() for part in url.split(',') if part.strip()]
+    if not urls:
+        return None
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        texts = [text for text in executor.map(_read_metrics, urls) if text is not None]
+    if not texts:
+        return None
+
+    tasks = defaultdict(lambda: {'succeeded': 0, 'failed': 0, 'count': 0, 'total_time': 0.0})
+    codes = defaultdict(int)
+    api_count = api_time = 0.0
+
+    families = (family for text in texts for family in text_string_to_metric_families(text))
+    for family in families:
+        for sample in family.samples:
+            if sample.name == 'celery_tasks_total':
+                task = tasks[sample.labels['task']]
+                if sample.labels['state'] == 'SUCCESS':
+                    task['succeeded'] += int(sample.value)
+                elif sample.labels['state'] == 'FAILURE':
+                    task['failed'] += int(sample.value)
+            elif sample.name == 'celery_task_duration_seconds_count':
+                tasks[sample.labels['task']]['count'] += int(sample.value)
+            elif sample.name == 'celery_task_duration_seconds_sum':
+                tasks[sample.labels['task']]['total_time'] += sample.value
+            elif sample.name == 'telegram_api_requests_total':
+                codes[sample.labels['code']] += int(sample.value)
+            elif sample.name == 'telegram_api_request_duration_seconds_count':
+                api_count += sample.value
+            elif sample.name == 'telegram_api_request_duration_seconds_sum':
+                api_time += sample.value
+
+    return {
+        'tasks': {
+            name: {**task, 'average_time': task['total_time'] / task['count'] if task['count'] else 0.0}
+            for name, task in sorted(tasks.items())
+        },
+        'codes': dict(sorted(codes.items())),
+        'api_requests': int(api_count),
+        'api_average_time': api_time / api_count if api_count else 0.0,
+    }
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0006_helpbutton_helppart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='file_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='file_id',
+            field=models.TextField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0007_document_file_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sending', 'Отправляется'), ('sent', 'Доставлено'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('message_id', models.BigIntegerField(blank=True, null=True, verbose_name='Идентификатор сообщения')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('mailing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='panel.mailing', verbose_name='Рассылка')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='panel.user', verbose_name='Сотрудник')),
+            ],
+            options={
+                'verbose_name': 'Доставка рассылки',
+                'verbose_name_plural': 'Доставки рассылок',
+                'indexes': [models.Index(fields=['mailing', 'status'], name='panel_maili_mailing_a85d87_idx')],
+                'unique_together': {('mailing', 'user')},
+            },
+        ),
+    ]
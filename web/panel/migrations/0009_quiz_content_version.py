@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0008_mailingdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия содержимого'),
+        ),
+    ]
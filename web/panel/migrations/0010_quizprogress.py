@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0009_quiz_content_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizProgress',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='quiz_progress', serialize=False, to='panel.user', verbose_name='Сотрудник')),
+                ('total_quizzes', models.PositiveIntegerField(default=0, verbose_name='Всего квизов')),
+                ('passed_quizzes', models.PositiveIntegerField(default=0, verbose_name='Пройдено квизов')),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя попытка')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quiz_progress', to='panel.department', verbose_name='Подразделение')),
+            ],
+            options={
+                'verbose_name': 'Прогресс по квизам',
+                'verbose_name_plural': 'Прогресс по квизам',
+            },
+        ),
+    ]
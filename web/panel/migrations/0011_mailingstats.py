@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0010_quizprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingStats',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Статистика рассылок',
+                'verbose_name_plural': 'Статистика рассылок',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('panel.mailing',),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0011_mailingstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=255, verbose_name='Задача')),
+                ('args', models.JSONField(default=list, verbose_name='Аргументы')),
+                ('eta', models.DateTimeField(blank=True, null=True, verbose_name='Выполнить не раньше')),
+                ('dedup_key', models.CharField(max_length=255, unique=True, verbose_name='Ключ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Передано в очередь')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+            ],
+            options={
+                'verbose_name': 'Задача в outbox',
+                'verbose_name_plural': 'Задачи в outbox',
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['attempts', 'id'], name='panel_outbox_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0012_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDigestItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('document', 'Документ'), ('quiz', 'Квиз')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Объект')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Уведомление для дайджеста',
+                'verbose_name_plural': 'Уведомления для дайджеста',
+            },
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from ..progress import backfill_quiz_progress
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0013_notificationdigestitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_quiz_progress, migrations.RunPython.noop),
+    ]
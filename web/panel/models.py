@@ -51,6 +51,8 @@ class Document(models.Model):
     title = models.CharField('Название документа', max_length=255)
     description = models.TextField('Описание', null=True, blank=True)
     file = models.FileField('Файл', upload_to='documents/')
+    file_id = models.TextField(null=True, editable=False)
+    file_hash = models.CharField(max_length=64, null=True, editable=False)
     department = models.ManyToManyField(
         Department,
         verbose_name='Подразделения',
@@ -71,6 +73,7 @@ class Quiz(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, verbose_name='Документ', related_name='quiz')
     department = models.ForeignKey(Department, on_delete=models.CASCADE, verbose_name='Подразделение', related_name='quizzes')
     send_delay_hours = models.PositiveIntegerField('Задержка отправки (часы)', default=0, editable=False)
+    content_version = models.PositiveIntegerField('Версия содержимого', default=1, editable=False)
 
     def __str__(self):
         return self.title
@@ -126,6 +129,27 @@ class QuizAttempt(models.Model):
         unique_together = ('user', 'quiz')
 
 
+class QuizProgress(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, verbose_name='Сотрудник', related_name='quiz_progress')
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name='Подразделение',
+        related_name='quiz_progress'
+    )
+    total_quizzes = models.PositiveIntegerField('Всего квизов', default=0)
+    passed_quizzes = models.PositiveIntegerField('Пройдено квизов', default=0)
+    last_attempt_at = models.DateTimeField('Последняя попытка', null=True, blank=True)
+
+    def __str__(self):
+        return f'Прогресс {self.user}'
+
+    class Meta:
+        verbose_name = 'Прогресс по квизам'
+        verbose_name_plural = 'Прогресс по квизам'
+
+
 class UserAnswer(models.Model):
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, verbose_name='Попытка', related_name='user_answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE, verbose_name='Вопрос')
@@ -163,6 +187,78 @@ class Mailing(models.Model):
         return f"Рассылка {self.datetime} ({dest})"
 
 
+class MailingStats(Mailing):
+    class Meta:
+        proxy = True
+        verbose_name = 'Статистика рассылок'
+        verbose_name_plural = 'Статистика рассылок'
+
+
+class MailingDelivery(models.Model):
+    statuses = {
+        'pending': 'Ожидает отправки',
+        'sending': 'Отправляется',
+        'sent': 'Доставлено',
+        'failed': 'Ошибка',
+    }
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, verbose_name='Рассылка', related_name='deliveries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Сотрудник', related_name='deliveries')
+    status = models.CharField('Статус', max_length=16, choices=statuses, default='pending')
+    message_id = models.BigIntegerField('Идентификатор сообщения', null=True, blank=True)
+    error = models.TextField('Ошибка', null=True, blank=True)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    def __str__(self):
+        return f'{self.mailing} → {self.user}'
+
+    class Meta:
+        verbose_name = 'Доставка рассылки'
+        verbose_name_plural = 'Доставки рассылок'
+        unique_together = ('mailing', 'user')
+        indexes = [models.Index(fields=['mailing', 'status'])]
+
+
+class OutboxMessage(models.Model):
+    task_name = models.CharField('Задача', max_length=255)
+    args = models.JSONField('Аргументы', default=list)
+    eta = models.DateTimeField('Выполнить не раньше', null=True, blank=True)
+    dedup_key = models.CharField('Ключ', max_length=255, unique=True)
+    created_at = models.DateTimeField('Создано', auto_now_add=True)
+    dispatched_at = models.DateTimeField('Передано в очередь', null=True, blank=True)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    error = models.TextField('Ошибка', null=True, blank=True)
+
+    def __str__(self):
+        return self.dedup_key
+
+    class Meta:
+        verbose_name = 'Задача в outbox'
+        verbose_name_plural = 'Задачи в outbox'
+        indexes = [
+            models.Index(
+                fields=['attempts', 'id'], condition=models.Q(dispatched_at__isnull=True), name='panel_outbox_pending_idx'
+            ),
+        ]
+
+
+class NotificationDigestItem(models.Model):
+    kinds = {
+        'document': 'Документ',
+        'quiz': 'Квиз',
+    }
+    kind = models.CharField('Тип', max_length=16, choices=kinds)
+    object_id = models.PositiveBigIntegerField('Объект')
+    created_at = models.DateTimeField('Создано', auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
+
+    class Meta:
+        verbose_name = 'Уведомление для дайджеста'
+        verbose_name_plural = 'Уведомления для дайджеста'
+
+
 class Attachments(models.Model):
     types = {
         'photo': 'Фото',
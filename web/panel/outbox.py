@@ -0,0 +1,79 @@
+import logging
+from datetime import datetime, timedelta
+
+from celery import current_app
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+RELAY_BATCH_SIZE = 100
+DISPATCHED_RETENTION = timedelta(days=7)
+
+
+def enqueue(task, *args, dedup_key: str, eta: datetime | None = None):
+    """Writes a Celery task into the outbox, within the caller's transaction.
+
+    ``relay`` hands it over to Celery later, with ``dedup_key`` as the task id.
+    A key that is already in the outbox is ignored, so the same event is queued once.
+    """
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(task_name=task.name, args=list(args), eta=eta, dedup_key=dedup_key)],
+        ignore_conflicts=True,
+    )
+
+
+def relay(batch_size: int = RELAY_BATCH_SIZE) -> int:
+    """Sends pending outbox rows to the broker in batches, returns how many were sent.
+
+    A row is marked as dispatched only after the broker took it, so a crash in between
+    sends it again (at least once); the task id lets consumers spot the repeat.
+    Several relays can run at once, rows locked by another one are skipped.
+    """
+    relayed = 0
+    while True:
+        with transaction.atomic():
+            messages = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True)
+                # Rows that failed go last, so that one which keeps failing does not hold up the rest.
+                .order_by('attempts', 'id')[:batch_size]
+            )
+            if not messages:
+                break
+
+            sent, failed = _send(messages)
+            if sent:
+                OutboxMessage.objects.filter(id__in=[message.id for message in sent]).update(
+                    dispatched_at=timezone.now()
+                )
+            if failed:
+                failed.attempts += 1
+                failed.save(update_fields=['attempts', 'error'])
+        relayed += len(sent)
+        if failed or len(messages) < batch_size:
+            break
+
+    OutboxMessage.objects.filter(dispatched_at__lt=timezone.now() - DISPATCHED_RETENTION).delete()
+    return relayed
+
+
+def _send(messages: list[OutboxMessage]) -> tuple[list[OutboxMessage], OutboxMessage | None]:
+    # One broker connection for the whole batch; the first error stops it, the rest waits for the next run.
+    sent = []
+    try:
+        with current_app.producer_or_acquire() as producer:
+            for message in messages:
+                current_app.send_task(
+                    message.task_name, args=message.args, eta=message.eta, task_id=message.dedup_key,
+                    producer=producer,
+                )
+                sent.append(message)
+    except Exception as e:
+        failed = messages[len(sent)]
+        logger.warning('Could not relay %s: %s', failed.dedup_key, e)
+        failed.error = str(e)
+        return sent, failed
+    return sent, None
@@ -0,0 +1,86 @@
+from itertools import batched
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Quiz, QuizAttempt, QuizProgress, User
+
+REBUILD_BATCH_SIZE = 2000
+
+
+def refresh_quiz_progress(users=None):
+    """Recomputes the progress rows of ``users`` (all users by default) from quizzes and attempts."""
+    return _rebuild(User, Quiz, QuizAttempt, QuizProgress, users)
+
+
+def backfill_quiz_progress(apps, schema_editor):
+    """``RunPython`` version of :func:`refresh_quiz_progress`, works on the models of the migration state."""
+    _rebuild(*(apps.get_model('panel', name) for name in ('User', 'Quiz', 'QuizAttempt', 'QuizProgress')))
+
+
+def _rebuild(User, Quiz, QuizAttempt, QuizProgress, users=None):
+    users = User.objects.all() if users is None else users
+
+    quizzes_total = (
+        Quiz.objects.filter(department=OuterRef('department'))
+        .values('department')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    department_attempts = QuizAttempt.objects.filter(user=OuterRef('pk'), quiz__department=OuterRef('department'))
+    quizzes_passed = department_attempts.values('user').annotate(count=Count('quiz', distinct=True)).values('count')
+    last_attempt_at = (
+        QuizAttempt.objects.filter(user=OuterRef('pk'))
+        .values('user')
+        .annotate(last=Max('completed_at'))
+        .values('last')
+    )
+
+    rows = (
+        users.annotate(
+            total=Coalesce(Subquery(quizzes_total, output_field=IntegerField()), 0),
+            passed=Coalesce(Subquery(quizzes_passed, output_field=IntegerField()), 0),
+            last_attempt=Subquery(last_attempt_at),
+        )
+        .values_list('id', 'department_id', 'total', 'passed', 'last_attempt')
+        .iterator(chunk_size=REBUILD_BATCH_SIZE)
+    )
+
+    refreshed = 0
+    with transaction.atomic():
+        for chunk in batched(rows, REBUILD_BATCH_SIZE):
+            QuizProgress.objects.bulk_create(
+                [
+                    QuizProgress(user_id=user_id, department_id=department_id, total_quizzes=total,
+                                 passed_quizzes=passed, last_attempt_at=last_attempt)
+                    for user_id, department_id, total, passed, last_attempt in chunk
+                ],
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['department', 'total_quizzes', 'passed_quizzes', 'last_attempt_at'],
+            )
+            refreshed += len(chunk)
+    return refreshed
+
+
+def quiz_added(department_id):
+    QuizProgress.objects.filter(department_id=department_id).update(total_quizzes=F('total_quizzes') + 1)
+
+
+def quiz_removed(department_id):
+    QuizProgress.objects.filter(department_id=department_id).update(
+        total_quizzes=Greatest(F('total_quizzes') - 1, Value(0))
+    )
+
+
+def attempt_added(attempt: QuizAttempt):
+    progress = QuizProgress.objects.filter(user_id=attempt.user_id)
+    progress.update(last_attempt_at=attempt.completed_at)
+    progress.filter(department__quizzes=attempt.quiz_id).update(passed_quizzes=F('passed_quizzes') + 1)
+
+
+def attempt_removed(attempt: QuizAttempt):
+    QuizProgress.objects.filter(user_id=attempt.user_id, department__quizzes=attempt.quiz_id).update(
+        passed_quizzes=Greatest(F('passed_quizzes') - 1, Value(0))
+    )
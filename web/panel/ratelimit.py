@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_KEY = 'hrbot:ratelimit:global'
+CHAT_KEY = 'hrbot:ratelimit:chat:{}'
+PAUSE_KEY = 'hrbot:ratelimit:pause'
+WARNING_INTERVAL = 60
+
+# Token buckets are kept as {tokens, ts} hashes and refilled on read, the clock is Redis' own
+# so every process sees the same time. Returns how long to wait, "0" when the tokens were taken.
+# Bulk traffic has to leave the reserve in the buckets, interactive traffic passes a zero reserve.
+ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+
+local paused = redis.call('PTTL', KEYS[1])
+if paused > 0 then
+    return tostring(paused / 1000)
+end
+
+local function bucket(key, rate, capacity, reserve, cost)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    cost = math.min(cost, capacity - reserve)
+    local wait = math.max(0, (cost + reserve - tokens) / rate)
+    return tokens - cost, wait
+end
+
+local function store(key, tokens, rate, capacity)
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+
+local cost = tonumber(ARGV[1])
+local global_rate, global_capacity = tonumber(ARGV[2]), tonumber(ARGV[3])
+local global_left, wait = bucket(KEYS[2], global_rate, global_capacity, tonumber(ARGV[4]), cost)
+
+local chat_rate, chat_capacity, chat_left
+if KEYS[3] then
+    chat_rate, chat_capacity = tonumber(ARGV[5]), tonumber(ARGV[6])
+    local chat_wait
+    chat_left, chat_wait = bucket(KEYS[3], chat_rate, chat_capacity, tonumber(ARGV[7]), 1)
+    wait = math.max(wait, chat_wait)
+end
+
+if wait > 0 then
+    return tostring(wait)
+end
+store(KEYS[2], global_left, global_rate, global_capacity)
+if KEYS[3] then
+    store(KEYS[3], chat_left, chat_rate, chat_capacity)
+end
+return '0'
+"""
+
+# A shorter retry_after never cuts an earlier, longer pause.
+PAUSE_SCRIPT = """
+if redis.call('PTTL', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], 1, 'PX', ARGV[1])
+end
+"""
+
+
+def message_cost(method: str, media: list | None = None) -> int:
+    """How many messages a Bot API call sends, 0 for calls that are not rate limited."""
+    if method == 'sendChatAction' or not method.startswith(('send', 'copy', 'forward')):
+        return 0
+    if method == 'sendMediaGroup' and media:
+        return len(media)
+    return 1
+
+
+class BaseRateCoordinator:
+    """Telegram rate budgets shared by every process that sends with the bot token.
+
+    ``interactive`` callers (the bot answering users) may use the whole budget, bulk callers
+    (mailings, notifications) have to leave ``TELEGRAM_INTERACTIVE_RESERVE`` messages of the
+    global budget and the burst of every chat to them. A 429 reported by anyone pauses everybody.
+    """
+
+    def __init__(self, interactive: bool = False, global_rate: float = config.TELEGRAM_GLOBAL_RATE,
+                 chat_rate: float = config.TELEGRAM_CHAT_RATE, chat_burst: int = config.TELEGRAM_CHAT_BURST,
+                 reserve: int = config.TELEGRAM_INTERACTIVE_RESERVE):
+        self.args = [
+            global_rate, global_rate, 0 if interactive else reserve,
+            chat_rate, chat_burst, 0 if interactive else chat_burst - 1,
+        ]
+        self._warned_at = 0.0
+
+    def _keys(self, chat_id: int | None) -> list[str]:
+        keys = [PAUSE_KEY, GLOBAL_KEY]
+        if chat_id is not None:
+            keys.append(CHAT_KEY.format(chat_id))
+        return keys
+
+    def _unavailable(self, error: redis.RedisError):
+        # Callers fall back to their own limits, a warning a minute is enough.
+        if time.monotonic() - self._warned_at > WARNING_INTERVAL:
+            self._warned_at = time.monotonic()
+            logger.warning('Telegram rate coordinator is unavailable: %s', error)
+
+
+class RateCoordinator(BaseRateCoordinator):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        client = redis.Redis.from_url(settings.REDIS_URL)
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._pause = client.register_script(PAUSE_SCRIPT)
+
+    def acquire(self, chat_id: int | None, cost: int = 1) -> bool:
+        """Blocks until the message fits into the budgets, returns False when Redis can't be reached."""
+        while True:
+            try:
+                wait = float(self._acquire(keys=self._keys(chat_id), args=[cost, *self.args]))
+            except redis.RedisError as e:
+                self._unavailable(e)
+                return False
+            if wait <= 0:
+                return True
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        try:
+            self._pause(keys=[PAUSE_KEY], args=[int(seconds * 1000)])
+        except redis.RedisError as e:
+            self._unavailable(e)
+
+
+class AsyncRateCoordinator(BaseRateCoordinator):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+        self._acquire = self.client.register_script(ACQUIRE_SCRIPT)
+        self._pause = self.client.register_script(PAUSE_SCRIPT)
+
+    async def acquire(self, chat_id: int | None, cost: int = 1) -> bool:
+        while True:
+            try:
+                wait = float(await self._acquire(keys=self._keys(chat_id), args=[cost, *self.args]))
+            except redis.RedisError as e:
+                self._unavailable(e)
+                return False
+            if wait <= 0:
+                return True
+            await asyncio.sleep(wait)
+
+    async def pause(self, seconds: float):
+        try:
+            await self._pause(keys=[PAUSE_KEY], args=[int(seconds * 1000)])
+        except redis.RedisError as e:
+            self._unavailable(e)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_coordinator: RateCoordinator | None = None
+
+
+def get_rate_coordinator() -> RateCoordinator | None:
+    """Returns the coordinator shared by the worker process, None when ``TELEGRAM_RATE_LIMIT`` is off."""
+    global _coordinator
+    if _coordinator is None and config.TELEGRAM_RATE_LIMIT:
+        _coordinator = RateCoordinator()
+    return _coordinator
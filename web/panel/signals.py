@@ -1,8 +1,17 @@
+import hashlib
+
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Mailing, Document, Quiz
+from config import config
+from . import digest, outbox, progress
+from .invalidation import publish_invalidation
+from .models import (
+    Mailing, Department, Document, Quiz, Question, Answer, AboutSection, HelpButton, HelpPart, User, QuizAttempt,
+    QuizProgress,
+)
 
 
 
@@ -11,18 +20,110 @@ def mailing_post_save(sender, instance: Mailing, created, **kwargs):
     from .tasks import send_mailing
 
     if created:
-        transaction.on_commit(lambda: send_mailing.apply_async(args=[instance.id], eta=instance.datetime))
+        outbox.enqueue(send_mailing, instance.id, dedup_key=f'send_mailing:{instance.id}', eta=instance.datetime)
+
+
+@receiver(pre_save, sender=Document)
+def document_pre_save(sender, instance: Document, **kwargs):
+    # A freshly uploaded file invalidates the cached Telegram file_id unless its content is the same.
+    if instance.file._committed:
+        return
+
+    file_hash = hashlib.sha256()
+    for chunk in instance.file.chunks():
+        file_hash.update(chunk)
+
+    if file_hash.hexdigest() != instance.file_hash:
+        instance.file_hash = file_hash.hexdigest()
+        instance.file_id = None
 
 
 @receiver(post_save, sender=Document)
 def document_post_save(sender, instance: Document, created, **kwargs):
-    from .tasks import notify_new_document
+    from .tasks import cache_document_file_id
     if created:
-        transaction.on_commit(lambda: notify_new_document.delay(instance.id))
+        digest.add('document', instance.id)
+    # Without a service chat there is nowhere to upload the file to, every save would queue a no-op task.
+    if not instance.file_id and config.SERVICE_CHAT_ID:
+        outbox.enqueue(
+            cache_document_file_id, instance.id,
+            dedup_key=f'cache_document_file_id:{instance.id}:{instance.file_hash or ""}',
+        )
+
+
+@receiver(pre_save, sender=Quiz)
+def quiz_pre_save(sender, instance: Quiz, **kwargs):
+    # The version is read back from the database because questions and answers bump it behind the instance's back.
+    if instance.pk:
+        current = Quiz.objects.filter(pk=instance.pk).values_list('content_version', 'department_id').first()
+        if current is not None:
+            instance.content_version = current[0] + 1
+            instance._previous_department_id = current[1]
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance: Question, **kwargs):
+    Quiz.objects.filter(id=instance.quiz_id).update(content_version=F('content_version') + 1)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance: Answer, **kwargs):
+    Quiz.objects.filter(questions__id=instance.question_id).update(content_version=F('content_version') + 1)
 
 
 @receiver(post_save, sender=Quiz)
 def quiz_post_save(sender, instance: Quiz, created, **kwargs):
-    from .tasks import notify_new_quiz
     if created:
-        transaction.on_commit(lambda: notify_new_quiz.delay(instance.id))
+        progress.quiz_added(instance.department_id)
+        digest.add('quiz', instance.id)
+        return
+
+    previous_department_id = getattr(instance, '_previous_department_id', instance.department_id)
+    if previous_department_id != instance.department_id:
+        progress.refresh_quiz_progress(
+            User.objects.filter(department__in=[previous_department_id, instance.department_id])
+        )
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_post_delete(sender, instance: Quiz, **kwargs):
+    progress.quiz_removed(instance.department_id)
+
+
+@receiver(post_save, sender=QuizAttempt)
+def quiz_attempt_post_save(sender, instance: QuizAttempt, created, **kwargs):
+    if created:
+        progress.attempt_added(instance)
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def quiz_attempt_post_delete(sender, instance: QuizAttempt, **kwargs):
+    progress.attempt_removed(instance)
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance: User, **kwargs):
+    # New users and department changes are the only saves that invalidate the progress row.
+    if not QuizProgress.objects.filter(user_id=instance.id, department_id=instance.department_id).exists():
+        progress.refresh_quiz_progress(User.objects.filter(id=instance.id))
+
+
+@receiver(post_delete, sender=User)
+def user_post_delete(sender, instance: User, **kwargs):
+    # The bot would keep serving the deleted user from its cache until the entry expires.
+    user_id = instance.id
+    transaction.on_commit(lambda: publish_invalidation('user', user_id))
+
+
+@receiver(post_delete, sender=Department)
+def department_post_delete(sender, instance: Department, **kwargs):
+    # Users of the department are moved to "no department" without going through the admin.
+    QuizProgress.objects.filter(department__isnull=True).update(total_quizzes=0, passed_quizzes=0)
+    transaction.on_commit(lambda: publish_invalidation('user'))
+
+
+@receiver([post_save, post_delete], sender=AboutSection)
+@receiver([post_save, post_delete], sender=HelpButton)
+@receiver([post_save, post_delete], sender=HelpPart)
+def bot_content_changed(sender, **kwargs):
+    transaction.on_commit(lambda: publish_invalidation('content'))
@@ -1,183 +1,259 @@
-import json
+import asyncio
+import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import ExitStack
+from datetime import timedelta
+from itertools import batched
 
-import requests
+from asgiref.sync import sync_to_async
 from celery import shared_task
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
 
 from config import config
-from .models import Mailing, User, Document, Quiz, QuizAttempt
+from .broadcast import Broadcaster, build_mailing_request, extract_file_ids, get_message_id
+from . import digest, outbox
+from .models import Mailing, MailingDelivery, Attachments, User, Document, QuizProgress
+from .telegram import TelegramAPIError, get_client
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_CHUNK_SIZE = 500
+DELIVERY_BATCH_SIZE = 1000
+STALE_DELIVERY_TIMEOUT = timedelta(minutes=10)
 
 
 @shared_task
 def send_mailing(mailing_id: int):
     mailing = Mailing.objects.get(id=mailing_id)
 
-    attachments = mailing.attachments.all()
+    attachments = list(mailing.attachments.all())
+
+    _freeze_recipients(mailing)
+    # Rows left in "sending" by a worker that died mid-batch are handed out again.
+    mailing.deliveries.filter(
+        status='sending', updated_at__lt=timezone.now() - STALE_DELIVERY_TIMEOUT,
+    ).update(status='pending')
+
+    if not _prepare_attachments(mailing, attachments):
+        return
+
+    method, payload, _, cost = build_mailing_request(mailing, attachments)
+    stats = asyncio.run(_deliver(mailing.id, method, payload, cost))
+    logger.info(
+        'Mailing %s: sent %s, failed %s in %.1fs (%.1f msg/s)',
+        mailing_id, stats.sent, stats.failed, stats.elapsed, stats.rate,
+    )
+
+    if not mailing.deliveries.filter(status__in=['pending', 'sending']).exists():
+        mailing.is_ok = True
+        mailing.save()
+
+
+def _freeze_recipients(mailing: Mailing):
+    if mailing.deliveries.exists():
+        return
 
     users = User.objects.filter(is_active=True)
 
     if mailing.departments.exists():
         users = users.filter(department__in=mailing.departments.all())
-    
-    def send_mail(user_id):
-        if not attachments:
-            requests.post(
-                url=f'https://api.telegram.org/bot{config.BOT_TOKEN}/sendMessage',
-                json={
-                    'chat_id': user_id,
-                    'text': mailing.text,
-                    'parse_mode': 'HTML',
-                }
-            )
-            return
-
-        if len(attachments) == 1:
-            attachment = attachments[0]
-            attachment_type = attachment.type
-
-            if not attachment.file_id:
-                with open(attachment.file.path, 'rb') as f:
-                    files = {attachment_type: f}
-                    response = requests.post(
-                        url=f'https://api.telegram.org/bot{config.BOT_TOKEN}/send{attachment_type.capitalize()}',
-                        data={
-                            'chat_id': user_id,
-                            'caption': mailing.text,
-                            'parse_mode': 'HTML',
-                        },
-                        files=files
+
+    MailingDelivery.objects.bulk_create(
+        [MailingDelivery(mailing=mailing, user_id=user_id) for user_id in users.values_list('id', flat=True)],
+        batch_size=DELIVERY_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _prepare_attachments(mailing: Mailing, attachments: list) -> bool:
+    """Uploads every attachment once so that the fan-out only sends file_ids.
+
+    Files go to SERVICE_CHAT_ID. Without it, or when that upload fails, the mailing itself is uploaded
+    to the first reachable recipient, whose delivery is recorded right away. Returns False when an
+    attachment file is missing or Telegram rejects the mailing itself, the pending deliveries are failed then.
+    """
+    pending = [attachment for attachment in attachments if not attachment.file_id]
+    if not pending:
+        return True
+
+    client = get_client()
+
+    if config.SERVICE_CHAT_ID:
+        try:
+            for attachment in pending:
+                with attachment.file.open('rb') as f:
+                    message = getattr(client, f'send_{attachment.type}')(config.SERVICE_CHAT_ID, f)
+                extract_file_ids(message, [attachment])
+        except (TelegramAPIError, FileNotFoundError) as e:
+            logger.warning('Mailing %s: upload to the service chat failed, uploading to a recipient: %s',
+                           mailing.id, e)
+        else:
+            Attachments.objects.bulk_update(pending, ['file_id'])
+            return True
+
+    method, payload, files, _ = build_mailing_request(mailing, attachments)
+    for delivery in mailing.deliveries.filter(status='pending').order_by('id').iterator():
+        delivery.attempts += 1
+        try:
+            with ExitStack() as stack:
+                result = client.call(
+                    method,
+                    {'chat_id': delivery.user_id, **payload},
+                    files={name: stack.enter_context(open(path, 'rb')) for name, path in files.items()},
+                )
+        except FileNotFoundError as e:
+            logger.error('Mailing %s: attachment file is missing: %s', mailing.id, e)
+            _fail_pending(mailing, f'Файл вложения не найден: {e.filename}')
+            return False
+        except TelegramAPIError as e:
+            delivery.status, delivery.error = 'failed', str(e)
+            delivery.save(update_fields=['status', 'error', 'attempts', 'updated_at'])
+            if e.is_recipient_error:
+                continue
+            # A file that is too big or a bad caption fails for everybody, the next recipient would wait
+            # for the same upload to fail again.
+            logger.error('Mailing %s: Telegram rejected the mailing: %s', mailing.id, e)
+            _fail_pending(mailing, str(e))
+            return False
+
+        delivery.status, delivery.message_id = 'sent', get_message_id(result)
+        delivery.save(update_fields=['status', 'message_id', 'attempts', 'updated_at'])
+
+        extract_file_ids(result, attachments)
+        Attachments.objects.bulk_update(pending, ['file_id'])
+        return True
+    return True
+
+
+def _fail_pending(mailing: Mailing, error: str):
+    mailing.deliveries.filter(status='pending').update(status='failed', error=error, updated_at=timezone.now())
+
+
+def _claim_deliveries(mailing_id: int) -> list[MailingDelivery]:
+    close_old_connections()
+    with transaction.atomic():
+        deliveries = list(
+            MailingDelivery.objects.select_for_update(skip_locked=True)
+            .filter(mailing_id=mailing_id, status='pending')
+            .order_by('id')[:DELIVERY_BATCH_SIZE]
+        )
+        MailingDelivery.objects.filter(id__in=[delivery.id for delivery in deliveries]).update(
+            status='sending', attempts=F('attempts') + 1, updated_at=timezone.now(),
+        )
+    return deliveries
+
+
+def _save_deliveries(deliveries: list[MailingDelivery], results: dict):
+    close_old_connections()
+    now = timezone.now()
+    for delivery in deliveries:
+        result = results[delivery.user_id]
+        if isinstance(result, TelegramAPIError):
+            delivery.status, delivery.error = 'failed', str(result)
+        else:
+            delivery.status, delivery.message_id, delivery.error = 'sent', get_message_id(result), None
+        delivery.updated_at = now
+
+    MailingDelivery.objects.bulk_update(deliveries, ['status', 'message_id', 'error', 'updated_at'])
+
+
+async def _deliver(mailing_id: int, method: str, payload: dict, cost: int):
+    # A DB thread of the mailing's own: asgiref's shared thread would queue concurrent mailings of a threads
+    # pool behind each other and keep a connection that Celery never checks or closes.
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='mailing-db') as executor:
+        claim = sync_to_async(_claim_deliveries, thread_sensitive=False, executor=executor)
+        save = sync_to_async(_save_deliveries, thread_sensitive=False, executor=executor)
+        try:
+            async with Broadcaster() as broadcaster:
+                while deliveries := await claim(mailing_id):
+                    results = await broadcaster.broadcast(
+                        [delivery.user_id for delivery in deliveries], method, payload, cost=cost,
                     )
+                    await save(deliveries, results)
+        finally:
+            await sync_to_async(connections.close_all, thread_sensitive=False, executor=executor)()
+    return broadcaster.stats
 
-                    if attachment_type == 'photo':
-                        file_id = response.json()['result']['photo'][-1]['file_id']
-                    else:
-                        print(response.json())
-                        file_id = response.json()['result'][attachment_type]['file_id']
-
-                    attachment.file_id = file_id
-                    attachment.save()
-                    return
-
-            requests.post(
-                url=f'https://api.telegram.org/bot{config.BOT_TOKEN}/send{attachment_type.capitalize()}',
-                data={
-                    'chat_id': user_id,
-                    'caption': mailing.text,
-                    'parse_mode': 'HTML',
-                    attachment_type: attachment.file_id,
-                }
-            )
-            return
-
-        with ExitStack() as stack:
-            media_group = [
-                {
-                    'type': attachment.type,
-                    'media': f'attach://{attachment.file.name}' if not attachment.file_id else attachment.file_id,
-                } for attachment in attachments
-            ]
-
-            media_group[0]['caption'] = mailing.text
-
-            files = {}
-            for attachment in attachments:
-                if not attachment.file_id:
-                    file_obj = stack.enter_context(open(attachment.file.path, 'rb'))
-                    files[attachment.file.name] = file_obj
-
-            response = requests.post(
-                f'https://api.telegram.org/bot{config.BOT_TOKEN}/sendMediaGroup',
-                data={'chat_id': user_id, 'media': json.dumps(media_group)},
-                files=files if files else None
-            )
-
-            json_response = response.json()
-
-            for i, attachment in enumerate(attachments):
-                if attachment.type == 'photo':
-                    attachment.file_id = json_response['result'][i][attachment.type][-1]['file_id']
-                else:
-                    attachment.file_id = json_response['result'][i][attachment.type]['file_id']
-                attachment.save()
-
-    def send_mail_delay(user_id: int):
-        send_mail(user_id)
-        time.sleep(0.01)
-
-    for user in users:
-        send_mail_delay(user.id)
-
-    mailing.is_ok = True
-    mailing.save()
-
-
-def _send_telegram_message(user_id: int, text: str):
-    url = f'https://api.telegram.org/bot{config.BOT_TOKEN}/sendMessage'
-    payload = {
-        'chat_id': user_id,
-        'text': text,
-    }
-    try:
-        requests.post(url, json=payload)
-    except Exception as e:
-        print(f"Error sending message to {user_id}: {e}")
-    time.sleep(0.05)
+
+@shared_task
+def send_notification_digest():
+    messages = digest.collect()
+    if not messages:
+        return
+
+    stats = asyncio.run(_deliver_digest(messages))
+    logger.info('Notification digest: sent %s, failed %s in %.1fs', stats.sent, stats.failed, stats.elapsed)
+
+
+async def _deliver_digest(messages: list[tuple[str, list[int]]]):
+    async with Broadcaster() as broadcaster:
+        for text, user_ids in messages:
+            await broadcaster.broadcast(user_ids, 'sendMessage', {'text': text})
+    return broadcaster.stats
 
 
 @shared_task
-def notify_new_document(document_id: int):
+def cache_document_file_id(document_id: int):
+    if not config.SERVICE_CHAT_ID:
+        return
+
     try:
         doc = Document.objects.get(id=document_id)
-        users_to_notify = User.objects.filter(department__in=doc.department.all(), is_active=True)
-        message = f"📚 Появился новый документ: «{doc.title}».\n\nВы можете найти его в разделе «Мои документы»."
-        for user in users_to_notify:
-            _send_telegram_message(user.id, message)
     except Document.DoesNotExist:
-        pass
-
+        return
+    if doc.file_id:
+        return
 
-@shared_task
-def notify_new_quiz(quiz_id: int):
     try:
-        quiz = Quiz.objects.get(id=quiz_id)
-        users_to_notify = User.objects.filter(department=quiz.department, is_active=True)
-        message = f"❓ Добавлен новый тест: «{quiz.title}».\n\nПожалуйста, пройдите его в разделе «Квизы»."
-        for user in users_to_notify:
-            _send_telegram_message(user.id, message)
-    except Quiz.DoesNotExist:
-        pass
-    
-    
+        with doc.file.open('rb') as f:
+            message = get_client().send_document(config.SERVICE_CHAT_ID, f)
+    except (TelegramAPIError, FileNotFoundError) as e:
+        logger.warning('Error uploading document %s: %s', document_id, e)
+        return
+
+    Document.objects.filter(id=document_id, file_hash=doc.file_hash).update(
+        file_id=message['document']['file_id']
+    )
+
+
 @shared_task
 def send_daily_quiz_reminders():
-    users = User.objects.filter(is_active=True, department__isnull=False)
-
-    for user in users:
-        department_quizzes = Quiz.objects.filter(department=user.department)
-        
-        completed_quiz_ids = QuizAttempt.objects.filter(user=user).values_list('quiz_id', flat=True)
-        
-        pending_quizzes = department_quizzes.exclude(id__in=completed_quiz_ids)
-        
-        count = pending_quizzes.count()
-        
-        if count > 0:
-            text = (
-                f"🔔 <b>Напоминание</b>\n\n"
-                f"У вас есть непройденные тесты ({count} шт.).\n"
-                f"Пожалуйста, зайдите в раздел «Квизы» и пройдите их."
-            )
-            try:
-                requests.post(
-                    f'https://api.telegram.org/bot{config.BOT_TOKEN}/sendMessage',
-                    json={
-                        'chat_id': user.id,
-                        'text': text,
-                        'parse_mode': 'HTML'
-                    }
-                )
-                time.sleep(0.05)
-            except Exception as e:
-                print(f"Error sending reminder to {user.id}: {e}")
+    reminders = (
+        QuizProgress.objects.filter(user__is_active=True, department__isnull=False,
+                                    total_quizzes__gt=F('passed_quizzes'))
+        .annotate(pending=F('total_quizzes') - F('passed_quizzes'))
+        .values_list('user_id', 'pending')
+        .iterator(chunk_size=REMINDERS_CHUNK_SIZE)
+    )
+
+    for chunk in batched(reminders, REMINDERS_CHUNK_SIZE):
+        send_quiz_reminders_chunk.delay(chunk)
+
 
+@shared_task
+def send_quiz_reminders_chunk(reminders: list[tuple[int, int]]):
+    client = get_client()
+
+    for user_id, count in reminders:
+        text = (
+            f"🔔 <b>Напоминание</b>\n\n"
+            f"У вас есть непройденные тесты ({count} шт.).\n"
+            f"Пожалуйста, зайдите в раздел «Квизы» и пройдите их."
+        )
+        try:
+            client.send_message(user_id, text, parse_mode='HTML')
+        except TelegramAPIError as e:
+            logger.warning('Error sending reminder to %s: %s', user_id, e)
+        # The shared rate coordinator paces the client, the fixed delay is only for running without it.
+        if client.coordinator is None:
+            time.sleep(0.05)
+
+
+@shared_task
+def relay_outbox():
+    relayed = outbox.relay()
+    if relayed:
+        logger.info('Relayed %s outbox messages', relayed)
@@ -0,0 +1,148 @@
+import json
+import logging
+import time
+from typing import BinaryIO
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import config
+from .metrics import observe_api_request
+from .ratelimit import get_rate_coordinator, message_cost
+
+logger = logging.getLogger(__name__)
+
+InputFile = str | BinaryIO
+
+
+class TelegramAPIError(Exception):
+    def __init__(self, method: str, error_code: int, description: str, retry_after: int | None = None):
+        super().__init__(f'{method}: [{error_code}] {description}')
+        self.method = method
+        self.error_code = error_code
+        self.description = description
+        self.retry_after = retry_after
+
+    @property
+    def is_retryable(self) -> bool:
+        return self.retry_after is not None or self.error_code >= 500
+
+    @property
+    def is_recipient_error(self) -> bool:
+        """The chat can't receive messages (blocked the bot, deleted, never started it), others still can."""
+        return self.error_code == 403 or (self.error_code == 400 and 'chat not found' in self.description.lower())
+
+
+def parse_response(method: str, status: int, body: dict | None):
+    """Returns the ``result`` of a Bot API response or raises :class:`TelegramAPIError`."""
+    if isinstance(body, dict) and body.get('ok'):
+        return body['result']
+
+    body = body if isinstance(body, dict) else {}
+    parameters = body.get('parameters') or {}
+    raise TelegramAPIError(
+        method,
+        body.get('error_code', status),
+        body.get('description', 'Unexpected response'),
+        retry_after=parameters.get('retry_after'),
+    )
+
+
+class BotAPIClient:
+    def __init__(self, token: str = config.BOT_TOKEN, pool_size: int = 10, max_retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 60):
+        self.base_url = f'{config.TELEGRAM_API_URL}/bot{token}'
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.coordinator = get_rate_coordinator()
+
+        self.session = requests.Session()
+        self.session.mount(config.TELEGRAM_API_URL, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def call(self, method: str, params: dict, files: dict[str, BinaryIO] | None = None):
+        params = {key: value for key, value in params.items() if value is not None}
+        cost = message_cost(method, params.get('media'))
+        if files:
+            params = {
+                key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                for key, value in params.items()
+            }
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if cost and self.coordinator is not None:
+                self.coordinator.acquire(params.get('chat_id'), cost)
+            if files:
+                for file in files.values():
+                    file.seek(0)
+            started_at = time.perf_counter()
+            try:
+                if files:
+                    response = self.session.post(f'{self.base_url}/{method}', data=params, files=files,
+                                                 timeout=self.timeout)
+                else:
+                    response = self.session.post(f'{self.base_url}/{method}', json=params, timeout=self.timeout)
+                body = response.json()
+            except (requests.RequestException, ValueError) as e:
+                observe_api_request(method, 0, time.perf_counter() - started_at)
+                error = e
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            try:
+                result = parse_response(method, response.status_code, body)
+            except TelegramAPIError as e:
+                observe_api_request(method, e.error_code, time.perf_counter() - started_at)
+                if not e.is_retryable or attempt == self.max_retries:
+                    raise
+                error = e
+                if e.retry_after and self.coordinator is not None:
+                    self.coordinator.pause(e.retry_after)
+                time.sleep(e.retry_after or self.backoff * 2 ** attempt)
+                continue
+
+            observe_api_request(method, 'ok', time.perf_counter() - started_at)
+            return result
+
+        if isinstance(error, TelegramAPIError):
+            raise error
+        raise TelegramAPIError(method, 0, f'Request failed: {error!r}')
+
+    def _send_file(self, method: str, field: str, chat_id: int, file: InputFile, params: dict):
+        if isinstance(file, str):
+            return self.call(method, {'chat_id': chat_id, field: file, **params})
+        return self.call(method, {'chat_id': chat_id, **params}, files={field: file})
+
+    def send_message(self, chat_id: int, text: str, parse_mode: str | None = None, **params) -> dict:
+        return self.call('sendMessage', {'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode, **params})
+
+    def send_photo(self, chat_id: int, photo: InputFile, caption: str | None = None,
+                   parse_mode: str | None = None, **params) -> dict:
+        return self._send_file('sendPhoto', 'photo', chat_id, photo,
+                               {'caption': caption, 'parse_mode': parse_mode, **params})
+
+    def send_video(self, chat_id: int, video: InputFile, caption: str | None = None,
+                   parse_mode: str | None = None, **params) -> dict:
+        return self._send_file('sendVideo', 'video', chat_id, video,
+                               {'caption': caption, 'parse_mode': parse_mode, **params})
+
+    def send_document(self, chat_id: int, document: InputFile, caption: str | None = None,
+                      parse_mode: str | None = None, **params) -> dict:
+        return self._send_file('sendDocument', 'document', chat_id, document,
+                               {'caption': caption, 'parse_mode': parse_mode, **params})
+
+    def send_media_group(self, chat_id: int, media: list[dict],
+                         files: dict[str, BinaryIO] | None = None, **params) -> list[dict]:
+        return self.call('sendMediaGroup', {'chat_id': chat_id, 'media': media, **params}, files=files)
+
+
+_client: BotAPIClient | None = None
+
+
+def get_client() -> BotAPIClient:
+    """Returns the client shared by every task of the worker process."""
+    global _client
+    if _client is None:
+        _client = BotAPIClient()
+    return _client
@@ -0,0 +1,145 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+
+from config import config
+from perf.harness import callback_update, create_fake_session, message_update
+from ..models import AboutSection, Answer, Department, Document, HelpButton, HelpPart, Question, Quiz, User
+
+
+class BotHandlerQueriesTests(TestCase):
+    """Queries of every bot handler, with cold caches, so the user lookup of ``UserMiddleware``
+    and loading the cached quiz or content are included.
+
+    Atomic blocks run inside the test's transaction and cost a savepoint and its release.
+    """
+
+    QUERIES = {
+        # User lookup, get_or_create (lookup and insert), the new user's progress row: check, user counts,
+        # insert; in two atomic blocks.
+        'middleware.new_user': 10,
+        'start.handle_start': 1,
+        # User lookup and the department's documents.
+        'menu.handle_my_documents': 2,
+        # User lookup and the document.
+        'menu.handle_document_press': 2,
+        # User lookup and the quizzes annotated with the user's attempts.
+        'quiz.handle_my_quizzes': 2,
+        # User lookup, attempt check, quiz version and the question tree (quiz, questions, answers).
+        'quiz.handle_start_quiz': 6,
+        'quiz.handle_answer': 1,
+        # Also stores the attempt with its answers and updates the progress row, in an atomic block.
+        'quiz.handle_answer[finish]': 7,
+        # Content cache: sections, help buttons, help text.
+        'info.handle_about': 4,
+        'info.handle_about_section_press': 4,
+        'info.handle_back_to_list': 4,
+        'help.help_f': 4,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Imported as ``bot.core``, the bot's ``core`` would clash with the web one under manage.py.
+        from aiogram import Bot, Dispatcher
+        from bot.core.handlers import help, info, menu, quiz, start
+        from bot.core.middlewares import UserMiddleware
+
+        # Routers can be attached to one dispatcher only, all tests share it.
+        cls.dp = Dispatcher()
+        cls.dp.message.outer_middleware(UserMiddleware())
+        cls.dp.callback_query.outer_middleware(UserMiddleware())
+        cls.dp.include_routers(start.router, menu.router, quiz.router, info.router, help.router)
+        cls.dp.message.middleware(cls.remember_handler)
+        cls.dp.callback_query.middleware(cls.remember_handler)
+        cls.bot = Bot(token='42:test', session=create_fake_session())
+        cls.called = []
+
+    @classmethod
+    async def remember_handler(cls, handler, event, data):
+        cls.called.append(handler_name(data['handler'].callback))
+        return await handler(event, data)
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отдел')
+        cls.user = User.objects.create(id=1, username='user', first_name='Сотрудник', department=department,
+                                       is_active=True)
+        cls.document = Document.objects.create(title='Регламент', file='documents/test.txt', file_id='file-id')
+        cls.document.department.add(department)
+        cls.quiz = Quiz.objects.create(title='Квиз', document=cls.document, department=department)
+        for q in range(3):
+            question = Question.objects.create(quiz=cls.quiz, text=f'Вопрос {q + 1}')
+            for a in range(3):
+                Answer.objects.create(question=question, text=f'Ответ {a + 1}', is_correct=a == 0)
+        cls.section = AboutSection.objects.create(title='Раздел', text='Текст')
+        HelpButton.objects.create(text_on_btn='Кнопка', url='https://example.com')
+        HelpPart.objects.create(id=1, text_on_message='Помощь')
+
+    def setUp(self):
+        from bot.core.cache import content_cache, quiz_cache
+
+        # Queries run in the test's thread and its transaction only without the bot's own DB threads.
+        self.enterContext(mock.patch.object(config, 'BOT_DB_THREADS', 0))
+        quiz_cache.invalidate()
+        content_cache.invalidate()
+
+    def assertUpdateQueries(self, name: str, update):
+        from bot.core.cache import content_cache, user_cache
+
+        user_cache.invalidate()
+        content_cache.invalidate()
+        self.called.clear()
+        with self.subTest(name), self.assertNumQueries(self.QUERIES[name]):
+            async_to_sync(self.dp.feed_update)(self.bot, update)
+        if name != 'middleware.new_user':
+            self.assertEqual(self.called, [name.split('[')[0]])
+
+    def test_every_handler_has_a_budget(self):
+        handlers = {
+            handler_name(handler.callback)
+            for router in self.dp.sub_routers
+            for observer in router.observers.values()
+            for handler in observer.handlers
+        }
+        self.assertEqual(handlers, {name.split('[')[0] for name in self.QUERIES} - {'middleware.new_user'})
+
+    def test_new_user(self):
+        self.assertUpdateQueries('middleware.new_user', message_update(999, '/start'))
+
+    def test_menu(self):
+        from bot.core.keyboards import DocumentCallback
+
+        self.assertUpdateQueries('start.handle_start', message_update(self.user.id, '/start'))
+        self.assertUpdateQueries('menu.handle_my_documents', message_update(self.user.id, 'Мои документы'))
+        self.assertUpdateQueries('menu.handle_document_press', callback_update(
+            self.user.id, DocumentCallback(document_id=self.document.id).pack(),
+        ))
+
+    def test_quiz(self):
+        from bot.core.keyboards import AnswerCallback, QuizCallback
+
+        self.assertUpdateQueries('quiz.handle_my_quizzes', message_update(self.user.id, 'Квизы'))
+        self.assertUpdateQueries('quiz.handle_start_quiz', callback_update(
+            self.user.id, QuizCallback(quiz_id=self.quiz.id).pack(),
+        ))
+        questions = list(self.quiz.questions.order_by('id'))
+        for question in questions:
+            name = 'quiz.handle_answer[finish]' if question == questions[-1] else 'quiz.handle_answer'
+            answer = question.answers.order_by('id').first()
+            self.assertUpdateQueries(name, callback_update(self.user.id, AnswerCallback(answer_id=answer.id).pack()))
+
+    def test_info(self):
+        from bot.core.keyboards import AboutCallback
+
+        self.assertUpdateQueries('info.handle_about', message_update(self.user.id, 'О компании'))
+        self.assertUpdateQueries('info.handle_about_section_press', callback_update(
+            self.user.id, AboutCallback(section_id=self.section.id).pack(),
+        ))
+        self.assertUpdateQueries('info.handle_back_to_list', callback_update(self.user.id, 'back_to_about_list'))
+        self.assertUpdateQueries('help.help_f', message_update(self.user.id, 'Помощь'))
+
+
+def handler_name(callback) -> str:
+    return f'{callback.__module__.rsplit(".", 1)[-1]}.{callback.__name__}'
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import (
+    AboutSection, Answer, Department, Document, HelpButton, HelpPart, Mailing, MailingDelivery, Question, Quiz,
+    QuizAttempt, User,
+)
+
+
+class ChangelistQueriesTests(TestCase):
+    """Changelists run the same number of queries whatever the number of rows on the page."""
+
+    # Session and admin user lookups are included.
+    QUERIES = {
+        'department': 5,
+        'user': 6,
+        'document': 7,
+        'quiz': 6,
+        'quizattempt': 7,
+        'mailing': 6,
+        # Session, admin user and one aggregated query over the recent mailings.
+        'mailingstats': 3,
+        'aboutsection': 5,
+        'helpbutton': 5,
+        # The single help text redirects to its change form.
+        'helppart': 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.batches = 0
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        # The mailing stats page would ask the Celery workers for their metrics.
+        self.enterContext(mock.patch('web.panel.admin.fetch_worker_metrics', return_value=None))
+
+    def add_rows(self, count: int):
+        self.batches += 1
+        department = Department.objects.create(name=f'Отдел {self.batches}')
+        other = Department.objects.create(name=f'Отдел {self.batches}Б')
+        document = Document.objects.create(title='Регламент', file='documents/test.txt')
+        document.department.add(department)
+
+        for i in range(count):
+            user = User.objects.create(id=self.batches * 1000 + i, username=f'user{self.batches}_{i}',
+                                       department=department, is_active=True)
+            quiz = Quiz.objects.create(title=f'Квиз {i}', document=document, department=department)
+            question = Question.objects.create(quiz=quiz, text='Вопрос')
+            Answer.objects.create(question=question, text='Ответ', is_correct=True)
+            QuizAttempt.objects.create(user=user, quiz=quiz, score=1)
+
+            mailing = Mailing.objects.create(text='Новости', datetime=timezone.now())
+            mailing.departments.add(department, other)
+            MailingDelivery.objects.create(mailing=mailing, user=user, status='sent')
+
+            AboutSection.objects.create(title=f'Раздел {i}', text='Текст', order=i)
+            HelpButton.objects.create(text_on_btn=f'Кнопка {i}', url='https://example.com')
+        HelpPart.objects.get_or_create(id=1, defaults={'text_on_message': 'Помощь'})
+
+    def assertChangelistQueries(self, model_name: str):
+        url = reverse(f'admin:panel_{model_name}_changelist')
+        for rows in (3, 10):
+            self.add_rows(rows)
+            with self.subTest(rows=rows), self.assertNumQueries(self.QUERIES[model_name]):
+                response = self.client.get(url)
+            self.assertIn(response.status_code, (200, 302))
+
+    def test_every_changelist_has_a_budget(self):
+        changelists = {model._meta.model_name for model in admin.site._registry if model._meta.app_label == 'panel'}
+        self.assertEqual(changelists, set(self.QUERIES))
+
+    def test_department_changelist(self):
+        self.assertChangelistQueries('department')
+
+    def test_user_changelist(self):
+        self.assertChangelistQueries('user')
+
+    def test_document_changelist(self):
+        self.assertChangelistQueries('document')
+
+    def test_quiz_changelist(self):
+        self.assertChangelistQueries('quiz')
+
+    def test_quizattempt_changelist(self):
+        self.assertChangelistQueries('quizattempt')
+
+    def test_mailing_changelist(self):
+        self.assertChangelistQueries('mailing')
+
+    def test_mailingstats_changelist(self):
+        self.assertChangelistQueries('mailingstats')
+
+    def test_aboutsection_changelist(self):
+        self.assertChangelistQueries('aboutsection')
+
+    def test_helpbutton_changelist(self):
+        self.assertChangelistQueries('helpbutton')
+
+    def test_helppart_changelist(self):
+        self.assertChangelistQueries('helppart')